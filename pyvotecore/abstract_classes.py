@@ -14,8 +14,11 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from tie_breaker import TieBreaker
+from ballot_store import BallotStore
+from aggregation import aggregate_ballots
 from abc import ABCMeta, abstractmethod
-from copy import copy, deepcopy
+from copy import copy
+import time
 import types
 
 # This class provides methods that most electoral systems make use of.
@@ -24,12 +27,28 @@ import types
 class VotingSystem(object):
     __metaclass__ = ABCMeta
 
+    progress = None
+    deadline = None
+    cancel = None
+
     @abstractmethod
-    def __init__(self, ballots, tie_breaker=None):
-        self.ballots = ballots
-        for ballot in self.ballots:
-            if "count" not in ballot:
-                ballot["count"] = 1
+    def __init__(self, ballots, tie_breaker=None, aggregate=True):
+
+        # Merge identical ballots unless asked not to. Merged counts are
+        # added up in a different order, so floating point tallies (as in
+        # STV) can differ from ballot by ballot ones in the last digit.
+        # Voting systems treat the caller's ballots as read-only, so ballots
+        # lacking a count are replaced rather than amended.
+        self.aggregate = aggregate
+        if self.aggregate:
+            self.ballots = aggregate_ballots(ballots)
+        elif isinstance(ballots, BallotStore):
+            self.ballots = ballots
+        else:
+            self.ballots = [
+                ballot if "count" in ballot else dict(ballot, count=1)
+                for ballot in ballots
+            ]
         self.tie_breaker = tie_breaker
         if type(self.tie_breaker) == types.ListType:
             self.tie_breaker = TieBreaker(self.tie_breaker)
@@ -43,11 +62,30 @@ class VotingSystem(object):
             data["tie_breaker"] = self.tie_breaker.as_list()
         return data
 
+    # Long counts call this from their main loops. It passes the phase and
+    # the steps done (out of total, where known) to the progress callback,
+    # then stops the count with an exception once the cancel event (such as
+    # a threading.Event) is set or the deadline (a time.time() value) passes.
+    # The caller's ballots are never modified, so a stopped count leaves
+    # nothing to undo.
+    def report_progress(self, phase, done, total=None):
+        if self.progress != None:
+            self.progress(phase, done, total)
+        if self.cancel != None and self.cancel.is_set():
+            raise Exception("The count was cancelled")
+        if self.deadline != None and time.time() > self.deadline:
+            raise Exception("The count passed its deadline")
+
     def break_ties(self, tied_objects, reverse_order=False):
         if self.tie_breaker == None:
             self.tie_breaker = TieBreaker(self.candidates)
         return self.tie_breaker.break_ties(tied_objects, reverse_order)
 
+    def order_ties(self, tied_objects, reverse_order=False):
+        if self.tie_breaker == None:
+            self.tie_breaker = TieBreaker(self.candidates)
+        return self.tie_breaker.order_ties(tied_objects, reverse_order)
+
 # Given a set of candidates, return a fixed number of winners
 
 
@@ -55,8 +93,8 @@ class FixedWinnerVotingSystem(VotingSystem):
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def __init__(self, ballots, tie_breaker=None):
-        super(FixedWinnerVotingSystem, self).__init__(ballots, tie_breaker)
+    def __init__(self, ballots, tie_breaker=None, aggregate=True):
+        super(FixedWinnerVotingSystem, self).__init__(ballots, tie_breaker, aggregate=aggregate)
 
     def as_dict(self):
         data = super(FixedWinnerVotingSystem, self).as_dict()
@@ -71,9 +109,9 @@ class MultipleWinnerVotingSystem(FixedWinnerVotingSystem):
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def __init__(self, ballots, tie_breaker=None, required_winners=1):
+    def __init__(self, ballots, tie_breaker=None, required_winners=1, aggregate=True):
         self.required_winners = required_winners
-        super(MultipleWinnerVotingSystem, self).__init__(ballots, tie_breaker)
+        super(MultipleWinnerVotingSystem, self).__init__(ballots, tie_breaker, aggregate=aggregate)
 
     def calculate_results(self):
         if self.required_winners == len(self.candidates):
@@ -91,8 +129,8 @@ class SingleWinnerVotingSystem(FixedWinnerVotingSystem):
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def __init__(self, ballots, tie_breaker=None):
-        super(SingleWinnerVotingSystem, self).__init__(ballots, tie_breaker)
+    def __init__(self, ballots, tie_breaker=None, aggregate=True):
+        super(SingleWinnerVotingSystem, self).__init__(ballots, tie_breaker, aggregate=aggregate)
 
     def as_dict(self):
         data = super(SingleWinnerVotingSystem, self).as_dict()
@@ -106,16 +144,20 @@ class AbstractSingleWinnerVotingSystem(SingleWinnerVotingSystem):
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def __init__(self, ballots, multiple_winner_class, tie_breaker=None):
+    def __init__(self, ballots, multiple_winner_class, tie_breaker=None, aggregate=True):
         self.multiple_winner_class = multiple_winner_class
-        super(AbstractSingleWinnerVotingSystem, self).__init__(ballots, tie_breaker=tie_breaker)
+        super(AbstractSingleWinnerVotingSystem, self).__init__(ballots, tie_breaker=tie_breaker, aggregate=aggregate)
 
     def calculate_results(self):
-        self.multiple_winner_instance = self.multiple_winner_class(self.ballots, tie_breaker=self.tie_breaker, required_winners=1)
+        self.multiple_winner_instance = self.multiple_winner_class(self.ballots, tie_breaker=self.tie_breaker, required_winners=1, aggregate=False, **self.multiple_winner_options())
         self.__dict__.update(self.multiple_winner_instance.__dict__)
         self.winner = list(self.winners)[0]
         del self.winners
 
+    # Extra keyword arguments for the multiple winner class
+    def multiple_winner_options(self):
+        return {}
+
     def as_dict(self):
         data = super(AbstractSingleWinnerVotingSystem, self).as_dict()
         data.update(self.multiple_winner_instance.as_dict())
@@ -129,9 +171,9 @@ class OrderingVotingSystem(VotingSystem):
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def __init__(self, ballots, tie_breaker=None, winner_threshold=None):
+    def __init__(self, ballots, tie_breaker=None, winner_threshold=None, aggregate=True):
         self.winner_threshold = winner_threshold
-        super(OrderingVotingSystem, self).__init__(ballots, tie_breaker=tie_breaker)
+        super(OrderingVotingSystem, self).__init__(ballots, tie_breaker=tie_breaker, aggregate=aggregate)
 
     def as_dict(self):
         data = super(OrderingVotingSystem, self).as_dict()
@@ -145,19 +187,19 @@ class AbstractOrderingVotingSystem(OrderingVotingSystem):
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def __init__(self, ballots, single_winner_class, winner_threshold=None, tie_breaker=None):
+    def __init__(self, ballots, single_winner_class, winner_threshold=None, tie_breaker=None, aggregate=True):
         self.single_winner_class = single_winner_class
-        super(AbstractOrderingVotingSystem, self).__init__(ballots, winner_threshold=winner_threshold, tie_breaker=tie_breaker)
+        super(AbstractOrderingVotingSystem, self).__init__(ballots, winner_threshold=winner_threshold, tie_breaker=tie_breaker, aggregate=aggregate)
 
     def calculate_results(self):
         self.order = []
         self.rounds = []
-        remaining_ballots = deepcopy(self.ballots)
+        remaining_ballots = self.ballots
         remaining_candidates = True
         while (remaining_candidates == True or len(remaining_candidates) > 1) and (self.winner_threshold == None or len(self.order) < self.winner_threshold):
 
             # Given the remaining ballots, who should win?
-            result = self.single_winner_class(deepcopy(remaining_ballots), tie_breaker=self.tie_breaker)
+            result = self.single_winner_class(remaining_ballots, tie_breaker=self.tie_breaker, aggregate=self.aggregate)
 
             # Mark the candidate that won
             r = {'winner': result.winner}
@@ -0,0 +1,72 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from ballot_store import BallotStore
+import types
+
+# These functions merge identical ballots into a single weighted ballot. Each
+# ballot is first reduced to a canonical, hashable form for its notation so
+# that equivalent ballots (e.g. the same groups listed in a different order)
+# are recognised as identical. Merged ballots keep the order in which they
+# were first seen.
+
+
+def aggregate_ballots(ballots, ballot_notation=None):
+    if isinstance(ballots, BallotStore):
+        return ballots.aggregated()
+    counts = {}
+    order = []
+    for ballot in ballots:
+        key = canonical_ballot(ballot["ballot"], ballot_notation)
+        if key not in counts:
+            counts[key] = 0
+            order.append(key)
+        counts[key] += ballot.get("count", 1)
+    return [
+        {"count": counts[key], "ballot": expand_ballot(key)}
+        for key in order
+    ]
+
+
+def canonical_ballot(ballot, ballot_notation=None):
+
+    # Groups are unordered internally and empty groups carry no preference
+    if ballot_notation == "grouping":
+        return ("grouping", tuple(tuple(sorted(group)) for group in ballot if len(group) > 0))
+
+    # Only the order of rankings matters, so reduce them to dense ranks
+    elif ballot_notation == "ranking":
+        dense_ranks = dict((rank, i) for i, rank in enumerate(sorted(set(ballot.values())), 1))
+        return ("ranking", tuple(sorted((candidate, dense_ranks[rank]) for candidate, rank in ballot.iteritems())))
+
+    # Ratings are kept exactly, as their magnitudes matter to range voting
+    elif type(ballot) == types.DictType:
+        return ("rating", tuple(sorted(ballot.iteritems())))
+    elif type(ballot) == types.ListType:
+        return ("ordering", tuple(ballot))
+    else:
+        return ("single", ballot)
+
+
+def expand_ballot(key):
+    notation, ballot = key
+    if notation == "grouping":
+        return [list(group) for group in ballot]
+    elif notation == "ranking" or notation == "rating":
+        return dict(ballot)
+    elif notation == "ordering":
+        return list(ballot)
+    else:
+        return ballot
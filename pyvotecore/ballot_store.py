@@ -0,0 +1,140 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+import array
+import types
+import numpy
+
+# This class stores ballots column-wise. Candidate names are mapped to dense
+# integer ids once, every ballot becomes a row of ratings (higher is better,
+# NaN where the voter left a candidate unmarked) and the ballot counts are
+# kept in a separate weights array. All voting systems accept a BallotStore
+# in place of the usual list of {"count": n, "ballot": ...} dicts.
+#
+# The ratings are dense: a store always takes a row of C floats per ballot,
+# however few candidates the ballot marks. For elections with many candidates
+# and short ballots, the usual list of dicts stays sparse (condorcet
+# standardize_ballots only keeps the marked candidates) and its pairwise
+# tallies are built a chunk of ballots at a time.
+
+
+class BallotStore(object):
+
+    def __init__(self, candidates, ratings, weights):
+        self.candidates = list(candidates)
+        self.candidate_ids = dict((candidate, i) for i, candidate in enumerate(self.candidates))
+        self.ratings = numpy.ascontiguousarray(ratings, dtype=float).reshape((len(weights), len(self.candidates)))
+        self.weights = numpy.ascontiguousarray(weights)
+
+    # Ballots may use any of the notations understood by the voting systems:
+    # "grouping", "ranking" or "rating" for Condorcet methods, and plain
+    # preference lists (or single candidates) for STV and plurality.
+    @classmethod
+    def from_ballots(cls, ballots, ballot_notation=None):
+        candidate_ids = {}
+        rows, columns, values = array.array('l'), array.array('l'), array.array('d')
+        weights = []
+        for row, ballot in enumerate(ballots):
+            weights.append(ballot.get("count", 1))
+            for candidate, rating in cls.ballot_ratings(ballot["ballot"], ballot_notation):
+                if candidate not in candidate_ids:
+                    candidate_ids[candidate] = len(candidate_ids)
+                rows.append(row)
+                columns.append(candidate_ids[candidate])
+                values.append(rating)
+
+        candidates = sorted(candidate_ids, key=candidate_ids.get)
+        ratings = numpy.empty((len(weights), len(candidates)))
+        ratings.fill(numpy.nan)
+        ratings[numpy.array(rows, dtype=int), numpy.array(columns, dtype=int)] = numpy.array(values)
+        weights = numpy.array(weights) if len(weights) > 0 else numpy.zeros(0, dtype=int)
+        return cls(candidates, ratings, weights)
+
+    # Later entries overwrite earlier ones, so ratings are listed in the same
+    # order as CondorcetHelper.standardize_ballots would assign them
+    @staticmethod
+    def ballot_ratings(ballot, ballot_notation):
+        if ballot_notation == "grouping":
+            for r, group in enumerate(reversed(ballot), 1):
+                for candidate in group:
+                    yield candidate, float(r)
+        elif ballot_notation == "ranking":
+            for candidate, rating in ballot.iteritems():
+                yield candidate, -float(rating)
+        elif (ballot_notation == "rating" or ballot_notation == None) and type(ballot) == types.DictType:
+            for candidate, rating in ballot.iteritems():
+                yield candidate, float(rating)
+        elif ballot_notation == "ordering" or ballot_notation == None:
+            if type(ballot) != types.ListType:
+                ballot = [ballot]
+            for position in range(len(ballot), 0, -1):
+                yield ballot[position - 1], -float(position)
+        else:
+            raise Exception("Unknown notation specified")
+
+    def __len__(self):
+        return len(self.weights)
+
+    # Yield each ballot as a rating dict of the candidates it marks
+    def __iter__(self):
+        weights = self.weights.tolist()
+        for i in xrange(len(self)):
+            yield {
+                "count": weights[i],
+                "ballot": dict(
+                    (candidate, rating)
+                    for candidate, rating in zip(self.candidates, self.ratings[i].tolist())
+                    if rating == rating
+                ),
+            }
+
+    # Yield each ballot as a preference list, most preferred candidate first
+    def orderings(self):
+        weights = self.weights.tolist()
+        marked_counts = self.marked().sum(axis=1).tolist()
+        order = numpy.argsort(-self.ratings, axis=1, kind="mergesort")
+        for i in xrange(len(self)):
+            yield {
+                "count": weights[i],
+                "ballot": [self.candidates[j] for j in order[i, :marked_counts[i]].tolist()],
+            }
+
+    def marked(self):
+        return ~numpy.isnan(self.ratings)
+
+    # Returns the ratings with columns in the given candidate order
+    def rank_matrix(self, candidates):
+        columns = [self.candidate_ids[candidate] for candidate in candidates]
+        if columns == range(len(self.candidates)):
+            return self.ratings
+        return self.ratings[:, columns]
+
+    # Returns a store in which identical rows are merged into one weighted row,
+    # kept in the order they were first seen
+    def aggregated(self):
+        if len(self) == 0:
+            return self
+        rows = numpy.ascontiguousarray(self.ratings).view(numpy.dtype((numpy.void, self.ratings.dtype.itemsize * len(self.candidates))))
+        _, first_index, inverse = numpy.unique(rows.ravel(), return_index=True, return_inverse=True)
+        order = numpy.argsort(first_index)
+        position = numpy.empty_like(order)
+        position[order] = numpy.arange(len(order))
+        weights = numpy.zeros(len(order), dtype=self.weights.dtype)
+        numpy.add.at(weights, position[inverse], self.weights)
+        return BallotStore(self.candidates, self.ratings[first_index[order]], weights)
+
+    def without_candidates(self, candidates):
+        remaining = [candidate for candidate in self.candidates if candidate not in candidates]
+        return BallotStore(remaining, self.rank_matrix(remaining), self.weights)
@@ -0,0 +1,134 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Ranked ballots in real elections tend to share long prefixes. This module
+# stores preference lists as a weighted prefix trie: each node is a candidate
+# reached through the candidates above it, weighted by the ballots that pass
+# through it. The root's children hold each candidate's first preferences,
+# so tallying a round only reads those, and removing a candidate splices its
+# nodes out of the trie, merging their children into their parents'. Memory
+# and work per round scale with distinct ballot prefixes instead of voters.
+
+from fractions import Fraction
+
+
+class TrieNode(object):
+
+    def __init__(self, candidate=None, parent=None, serial=0):
+        self.candidate = candidate
+        self.serial = serial
+        self.parent = parent
+        self.children = {}
+        self.weight = 0
+        self.ending = 0
+
+
+# This class counts STV and IRV elections (engine="trie") on a ballot trie.
+# Weights are summed per prefix rather than per ballot, which in floating
+# point would round differently from the other engines and could move a
+# tally across the quota. Weights are therefore kept exact, as integers until
+# a surplus transfer makes them fractions, and only reported as floats.
+class BallotTrie(object):
+
+    def __init__(self, ballots):
+        self.ballots = ballots
+        self.build(ballots)
+
+    def build(self, ballots, remaining_candidates=None):
+        self.root = TrieNode()
+        self.nodes = {}
+        serial = 0
+        for ballot in ballots:
+            count = BallotTrie.exact(ballot["count"])
+            node = self.root
+            node.weight += count
+            for candidate in ballot["ballot"]:
+                if remaining_candidates != None and candidate not in remaining_candidates:
+                    continue
+                if candidate not in node.children:
+                    serial += 1
+                    child = TrieNode(candidate, node, serial)
+                    self.nodes.setdefault(candidate, {})[child.serial] = child
+                    node.children[candidate] = child
+                node = node.children[candidate]
+                node.weight += count
+            node.ending += count
+
+    def has_votes(self):
+        return self.root.ending > 0 or any(child.weight > 0 for child in self.root.children.itervalues())
+
+    def reset(self, remaining_candidates):
+        self.build(self.ballots, remaining_candidates)
+
+    def tallies(self):
+        return dict(
+            (candidate, float(child.weight))
+            for candidate, child in self.root.children.iteritems()
+            if child.weight > 0
+        )
+
+    def transfer_surplus(self, winners, tallies, quota):
+        for winner in winners:
+            if winner in self.root.children:
+                tally = self.root.children[winner].weight
+                BallotTrie.scale(self.root.children[winner], Fraction(tally - quota, tally))
+
+    # Nodes are spliced in creation order, so that weights are always added
+    # up in the same order
+    def remove_candidates(self, candidates):
+        for candidate in candidates:
+            nodes = self.nodes.pop(candidate, {})
+            for serial in sorted(nodes):
+                self.splice(nodes[serial])
+
+    @staticmethod
+    def exact(count):
+        if count == int(count):
+            return int(count)
+        return Fraction(count)
+
+    # Multiply the weight of every ballot beneath a node
+    @staticmethod
+    def scale(node, factor):
+        nodes = [node]
+        while len(nodes) > 0:
+            node = nodes.pop()
+            node.weight *= factor
+            node.ending *= factor
+            nodes.extend(node.children.itervalues())
+
+    # Remove a node, handing its ballots to its parent
+    def splice(self, node):
+        parent = node.parent
+        del parent.children[node.candidate]
+        parent.ending += node.ending
+        for child in node.children.values():
+            self.attach(parent, child)
+
+    # Make a node a child of parent, merging it into any existing child for
+    # the same candidate
+    def attach(self, parent, node):
+        pairs = [(parent, node)]
+        while len(pairs) > 0:
+            parent, node = pairs.pop()
+            existing = parent.children.get(node.candidate)
+            if existing == None:
+                parent.children[node.candidate] = node
+                node.parent = parent
+                continue
+            existing.weight += node.weight
+            existing.ending += node.ending
+            del self.nodes[node.candidate][node.serial]
+            pairs.extend((existing, child) for child in node.children.itervalues())
@@ -0,0 +1,150 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+# Schulze STV compares every set of required_winners candidates with the
+# sets that differ from it by one candidate, so its graph has C(n, k) nodes
+# and up to C(n, k + 1) * (k + 1) * k edges. This module numbers each
+# candidate set with the combinatorial number system and keeps the edges in
+# flat arrays. Candidate sets are only turned back into tuples for results.
+#
+# The combinatorial number system ranks the k-subsets of 0..n-1 in colex
+# order: the subset c_1 < c_2 < ... < c_k is numbered
+# C(c_1, 1) + C(c_2, 2) + ... + C(c_k, k), giving every subset a distinct
+# number below C(n, k).
+from common_functions import combinations_count, source_components
+import array
+import numpy
+
+
+class CandidateSetGraph(object):
+
+    def __init__(self, candidates, size):
+        self.candidates = sorted(candidates)
+        self.candidate_ids = dict((candidate, i) for i, candidate in enumerate(self.candidates))
+        self.size = size
+        self.node_count = combinations_count(len(self.candidates), size)
+        self.binomials = [
+            [combinations_count(index, i) for i in range(size + 1)]
+            for index in range(len(self.candidates))
+        ]
+        self.live_nodes = numpy.ones(self.node_count, dtype=bool)
+        self.edge_buffers = (array.array('l'), array.array('l'), array.array('d'))
+        self.edge_arrays = None
+
+    # Returns the number of a set of candidates
+    def rank(self, candidate_set):
+        indices = sorted(self.candidate_ids[candidate] for candidate in candidate_set)
+        return sum(self.binomials[index][i] for i, index in enumerate(indices, 1))
+
+    # Returns the sorted tuple of candidates with the given number, taking
+    # the largest candidate index that fits at each step
+    def candidate_set(self, node):
+        indices = []
+        index = len(self.candidates)
+        for i in range(self.size, 0, -1):
+            index -= 1
+            while self.binomials[index][i] > node:
+                index -= 1
+            node -= self.binomials[index][i]
+            indices.append(index)
+        return tuple(self.candidates[index] for index in reversed(indices))
+
+    # Edges are given as (source, target, weight), with nodes as numbers
+    def add_edges(self, edges):
+        for source, target, weight in edges:
+            self.edge_buffers[0].append(source)
+            self.edge_buffers[1].append(target)
+            self.edge_buffers[2].append(weight)
+        self.edge_arrays = None
+
+    def edge_count(self):
+        return len(self.edge_buffers[2])
+
+    # The first edge_count edges are written as their raw sources, then
+    # targets, then weights, and read back the same way given how many there
+    # are
+    def write_edges(self, output, edge_count):
+        for buffer in self.edge_buffers:
+            buffer[:edge_count].tofile(output)
+
+    def read_edges(self, input, count):
+        for buffer in self.edge_buffers:
+            buffer.fromfile(input, count)
+        self.edge_arrays = None
+
+    # Returns the sources, targets and weights of the edges as arrays, along
+    # with a mask of the edges not yet removed
+    def edges(self):
+        if self.edge_arrays == None:
+            self.edge_arrays = (
+                numpy.array(self.edge_buffers[0], dtype=int),
+                numpy.array(self.edge_buffers[1], dtype=int),
+                numpy.array(self.edge_buffers[2], dtype=float),
+                numpy.ones(len(self.edge_buffers[2]), dtype=bool),
+            )
+        return self.edge_arrays
+
+    # Returns the candidate sets that no remaining edge leads to
+    def unbeaten_sets(self):
+        sources, targets, weights, live_edges = self.edges()
+        unbeaten = self.live_nodes.copy()
+        unbeaten[targets[live_edges]] = False
+        return set(self.candidate_set(node) for node in numpy.flatnonzero(unbeaten).tolist())
+
+    # Iterate through using the Schwartz set heuristic, as in SchulzeHelper,
+    # until no edges remain. Nodes without edges always belong to the Schwartz
+    # set, so only the nodes on remaining edges are searched. Before each
+    # step, step(number of actions so far) is called, if given.
+    def schwartz_set_heuristic(self, step=None):
+        sources, targets, weights, live_edges = self.edges()
+        actions = []
+        while live_edges.any():
+            if step != None:
+                step(len(actions))
+            edges = numpy.flatnonzero(live_edges)
+            nodes = numpy.union1d(sources[edges], targets[edges])
+            schwartz_set = set(
+                node
+                for component in source_components(nodes.tolist(), self.successors(nodes, sources[edges], targets[edges]))
+                for node in component
+            )
+            nodes_to_remove = [node for node in nodes.tolist() if node not in schwartz_set]
+
+            # Remove nodes at the end of non-cycle paths
+            if len(nodes_to_remove) > 0:
+                actions.append({'nodes': set(self.candidate_set(node) for node in nodes_to_remove)})
+                self.live_nodes[nodes_to_remove] = False
+                live_edges &= self.live_nodes[sources] & self.live_nodes[targets]
+
+            # If none exist, remove the weakest edges
+            else:
+                weakest = edges[weights[edges] == weights[edges].min()]
+                actions.append({'edges': set(
+                    (self.candidate_set(source), self.candidate_set(target))
+                    for source, target in zip(sources[weakest].tolist(), targets[weakest].tolist())
+                )})
+                live_edges[weakest] = False
+        return actions
+
+    @staticmethod
+    def successors(nodes, sources, targets):
+        order = numpy.argsort(sources, kind="mergesort")
+        sources, targets = sources[order], targets[order].tolist()
+        starts = numpy.searchsorted(sources, nodes, "left").tolist()
+        ends = numpy.searchsorted(sources, nodes, "right").tolist()
+        return dict(
+            (node, targets[start:end])
+            for node, start, end in zip(nodes.tolist(), starts, ends)
+        )
@@ -6,16 +6,71 @@ def matching_keys(dict, target_value):
     ])
 
 
-def unique_permutations(xs):
-    if len(xs) < 2:
-        yield xs
-    else:
-        h = []
-        for x in xs:
-            h.append(x)
-            if x in h[:-1]:
-                continue
-            ts = xs[:]
-            ts.remove(x)
-            for ps in unique_permutations(ts):
-                yield [x] + ps
+# The number of ways to choose k of n items
+def combinations_count(n, k):
+    if k < 0 or k > n:
+        return 0
+    count = 1
+    for i in range(min(k, n - k)):
+        count = count * (n - i) // (i + 1)
+    return count
+
+
+# Tarjan's algorithm, without recursion. Given a list of nodes and a dict
+# mapping each node to its successors, return the strongly connected
+# components (each a list of nodes) in reverse topological order.
+def strongly_connected_components(nodes, successors):
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    components = []
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors[root]))]
+        while len(work) > 0:
+            node, children = work[-1]
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors[child])))
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            else:
+                work.pop()
+                if len(work) > 0:
+                    parent = work[-1][0]
+                    lowlink[parent] = min(lowlink[parent], lowlink[node])
+                if lowlink[node] == index[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.remove(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+# Return the strongly connected components that no edge enters from outside,
+# i.e. the sources of the condensed graph
+def source_components(nodes, successors):
+    components = strongly_connected_components(nodes, successors)
+    component_ids = {}
+    for i, component in enumerate(components):
+        for node in component:
+            component_ids[node] = i
+    entered = set()
+    for node in nodes:
+        for child in successors[node]:
+            if component_ids[child] != component_ids[node]:
+                entered.add(component_ids[child])
+    return [component for i, component in enumerate(components) if i not in entered]
@@ -15,6 +15,9 @@
 
 from abc import ABCMeta, abstractmethod
 from abstract_classes import SingleWinnerVotingSystem
+from ballot_store import BallotStore
+from pairwise import ballots_pairwise_matrix, truncated_pairwise_matrix
+from common_functions import strongly_connected_components, source_components
 from pygraph.classes.digraph import digraph
 import itertools
 
@@ -23,38 +26,38 @@ class CondorcetHelper(object):
 
     def standardize_ballots(self, ballots, ballot_notation):
 
-        self.ballots = ballots
+        # Ballot stores already hold ratings
+        if isinstance(ballots, BallotStore):
+            self.ballots = ballots
+            self.candidates = set(self.ballots.candidates)
+            return
+
+        # The caller's ballots are left untouched; each standardized ballot
+        # is a new dict
         if ballot_notation == "grouping":
-            for ballot in self.ballots:
-                ballot["ballot"].reverse()
-                new_ballot = {}
-                r = 0
-                for rank in ballot["ballot"]:
-                    r += 1
-                    for candidate in rank:
-                        new_ballot[candidate] = r
-                ballot["ballot"] = new_ballot
+            def standardize(ballot):
+                return dict(
+                    (candidate, r)
+                    for r, rank in enumerate(reversed(ballot), 1)
+                    for candidate in rank
+                )
         elif ballot_notation == "ranking":
-            for ballot in self.ballots:
-                for candidate, rating in ballot["ballot"].iteritems():
-                    ballot["ballot"][candidate] = -float(rating)
+            def standardize(ballot):
+                return dict((candidate, -float(rating)) for candidate, rating in ballot.iteritems())
         elif ballot_notation == "rating" or ballot_notation == None:
-            for ballot in self.ballots:
-                for candidate, rating in ballot["ballot"].iteritems():
-                    ballot["ballot"][candidate] = float(rating)
+            def standardize(ballot):
+                return dict((candidate, float(rating)) for candidate, rating in ballot.iteritems())
         else:
             print ballot_notation
             raise Exception("Unknown notation specified")
+        self.ballots = [dict(ballot, ballot=standardize(ballot["ballot"])) for ballot in ballots]
 
+        # Candidates a voter left out are not padded onto the ballot; they
+        # are implicitly tied for last (see pairwise.UNRANKED)
         self.candidates = set()
         for ballot in self.ballots:
             self.candidates |= set(ballot["ballot"].keys())
 
-        for ballot in self.ballots:
-            lowest_preference = min(ballot["ballot"].values()) - 1
-            for candidate in self.candidates - set(ballot["ballot"].keys()):
-                ballot["ballot"][candidate] = lowest_preference
-
     def graph_winner(self):
         losing_candidates = set([edge[1] for edge in self.graph.edges()])
         winning_candidates = set(self.graph.nodes()) - losing_candidates
@@ -66,16 +69,23 @@ class CondorcetHelper(object):
         else:
             self.condorcet_completion_method()
 
+    # Returns a CxC matrix of how many voters preferred each candidate to each
+    # other candidate, in the given candidate order
+    @staticmethod
+    def ballots_into_matrix(candidates, ballots):
+        if isinstance(ballots, BallotStore):
+            return truncated_pairwise_matrix(ballots.rank_matrix(candidates), ballots.weights)
+        return ballots_pairwise_matrix(candidates, ballots)
+
     @staticmethod
     def ballots_into_graph(candidates, ballots):
+        candidates = list(candidates)
+        index = dict((candidate, i) for i, candidate in enumerate(candidates))
+        wins = CondorcetHelper.ballots_into_matrix(candidates, ballots).tolist()
         graph = digraph()
         graph.add_nodes(candidates)
         for pair in itertools.permutations(candidates, 2):
-            graph.add_edge(pair, sum([
-                ballot["count"]
-                for ballot in ballots
-                if ballot["ballot"][pair[0]] > ballot["ballot"][pair[1]]
-            ]))
+            graph.add_edge(pair, wins[index[pair[0]]][index[pair[1]]])
         return graph
 
     @staticmethod
@@ -85,6 +95,45 @@ class CondorcetHelper(object):
             for edge in graph.edges()
         ])
 
+    # The following take a graph of defeats, such as self.graph once weak
+    # edges are removed, and run in time linear in its size
+    @staticmethod
+    def strongly_connected_components(graph):
+        return strongly_connected_components(graph.nodes(), CondorcetHelper.successors(graph))
+
+    # The Schwartz set holds the candidates in the components that no outside
+    # candidate defeats
+    @staticmethod
+    def schwartz_set(graph):
+        return set(
+            candidate
+            for component in source_components(graph.nodes(), CondorcetHelper.successors(graph))
+            for candidate in component
+        )
+
+    # The Smith set holds the candidates in the components that no outside
+    # candidate defeats or ties, found from the graph of "not defeated by"
+    @staticmethod
+    def smith_set(graph):
+        candidates = graph.nodes()
+        successors = dict(
+            (candidate, [
+                other_candidate
+                for other_candidate in candidates
+                if other_candidate != candidate and not graph.has_edge((other_candidate, candidate))
+            ])
+            for candidate in candidates
+        )
+        return set(
+            candidate
+            for component in source_components(candidates, successors)
+            for candidate in component
+        )
+
+    @staticmethod
+    def successors(graph):
+        return dict((node, graph.neighbors(node)) for node in graph.nodes())
+
     @staticmethod
     def remove_weak_edges(graph):
         for pair in itertools.combinations(graph.nodes(), 2):
@@ -103,9 +152,9 @@ class CondorcetSystem(SingleWinnerVotingSystem, CondorcetHelper):
     __metaclass__ = ABCMeta
 
     @abstractmethod
-    def __init__(self, ballots, tie_breaker=None, ballot_notation=None):
+    def __init__(self, ballots, tie_breaker=None, ballot_notation=None, aggregate=True):
         self.standardize_ballots(ballots, ballot_notation)
-        super(CondorcetSystem, self).__init__(self.ballots, tie_breaker=tie_breaker)
+        super(CondorcetSystem, self).__init__(self.ballots, tie_breaker=tie_breaker, aggregate=aggregate)
 
     def calculate_results(self):
         self.graph = self.ballots_into_graph(self.candidates, self.ballots)
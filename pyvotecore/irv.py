@@ -4,13 +4,27 @@ from stv import STV
 
 class IRV(AbstractSingleWinnerVotingSystem):
 
-    def __init__(self, ballots, tie_breaker=None):
-        super(IRV, self).__init__(ballots, STV, tie_breaker=tie_breaker)
+    def __init__(self, ballots, tie_breaker=None, aggregate=True, engine="classic", bulk_exclusion=False, progress=None, deadline=None, cancel=None):
+        self.engine = engine
+        self.bulk_exclusion = bulk_exclusion
+        self.progress = progress
+        self.deadline = deadline
+        self.cancel = cancel
+        super(IRV, self).__init__(ballots, STV, tie_breaker=tie_breaker, aggregate=aggregate)
 
     def calculate_results(self):
         super(IRV, self).calculate_results()
         IRV.singularize(self.rounds)
 
+    def multiple_winner_options(self):
+        return {
+            "engine": self.engine,
+            "bulk_exclusion": self.bulk_exclusion,
+            "progress": self.progress,
+            "deadline": self.deadline,
+            "cancel": self.cancel,
+        }
+
     def as_dict(self):
         data = super(IRV, self).as_dict()
         IRV.singularize(data["rounds"])
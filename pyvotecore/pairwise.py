@@ -0,0 +1,123 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+import numpy
+
+# These functions tally pairwise preferences in bulk. Standardized ballots
+# become a matrix with one row per ballot and one column per candidate, and
+# the pairwise wins are computed one candidate row at a time so that memory
+# stays at O(B*C) rather than O(B*C*C).
+#
+# Ballots need not rate every candidate. A candidate missing from a ballot is
+# UNRANKED: tied with the other unranked candidates and below every ranked
+# one. Row i of the wins matrix only reads the ballots that ranked candidate
+# i, so a ballot ranking k candidates costs O(k*C) rather than O(C*C).
+
+UNRANKED = float("-inf")
+
+
+def rank_matrix(candidates, ballots):
+    index = dict((candidate, i) for i, candidate in enumerate(candidates))
+    rows, columns, ratings = [], [], []
+    for row, ballot in enumerate(ballots):
+        for candidate, rating in ballot["ballot"].iteritems():
+            rows.append(row)
+            columns.append(index[candidate])
+            ratings.append(rating)
+    ranks = numpy.empty((len(ballots), len(candidates)), dtype=float)
+    ranks.fill(UNRANKED)
+    ranks[rows, columns] = ratings
+    return ranks
+
+
+def count_vector(ballots):
+    return numpy.array([ballot["count"] for ballot in ballots])
+
+
+# Given a rank matrix and the matching ballot counts, return a CxC matrix where
+# entry [i][j] holds the number of voters that preferred candidate i to j. The
+# tallies are added to wins, if given, as though its ballots came first.
+def pairwise_matrix(ranks, counts, wins=None):
+    candidate_count = ranks.shape[1]
+    if counts.dtype.kind not in "iu":
+        counts = counts.astype(float)
+    if wins is None:
+        wins = numpy.zeros((candidate_count, candidate_count), dtype=counts.dtype)
+    elif counts.dtype == float and wins.dtype != float:
+        wins = wins.astype(float)
+    if len(counts) == 0:
+        return wins
+    ranked = ranks > UNRANKED
+    for i in range(candidate_count):
+        if ranked[:, i].all():
+            rows = slice(None)
+        else:
+            rows = ranked[:, i].nonzero()[0]
+            if len(rows) == 0:
+                continue
+        preferred = ranks[rows, i, numpy.newaxis] > ranks[rows]
+
+        # Integer counts sum exactly in any order, floats are summed
+        # sequentially so that they match a plain Python sum() bit for bit
+        if wins.dtype == float:
+            wins[i] = numpy.concatenate([
+                wins[i, numpy.newaxis],
+                numpy.where(preferred, counts[rows, numpy.newaxis], 0.0),
+            ]).cumsum(axis=0)[-1]
+        else:
+            wins[i] += numpy.dot(counts[rows], preferred.astype(counts.dtype))
+    return wins
+
+
+# As above, but for ratings in which NaN marks a candidate the voter left
+# unranked
+def truncated_pairwise_matrix(ratings, counts, wins=None):
+    ranks = numpy.where(numpy.isnan(ratings), UNRANKED, ratings)
+    return pairwise_matrix(ranks, counts, wins)
+
+
+# Tally a list of standardized ballots a chunk at a time, so that the rank
+# matrix never holds more than about chunk_cells entries
+def ballots_pairwise_matrix(candidates, ballots, chunk_cells=2 ** 20):
+    chunk_size = max(1, chunk_cells // max(1, len(candidates)))
+    wins = None
+    for start in range(0, max(1, len(ballots)), chunk_size):
+        chunk = ballots[start:start + chunk_size]
+        wins = pairwise_matrix(rank_matrix(candidates, chunk), count_vector(chunk), wins)
+    return wins
+
+
+# Given a CxC matrix of edge weights (UNRANKED where there is no edge), return
+# the matrix of strongest path strengths: entry [i][j] is the largest weight w
+# such that a path from i to j exists using only edges of weight at least w.
+# This is the Floyd-Warshall widest path algorithm, one vectorized step per
+# intermediate candidate.
+def strongest_paths(weights):
+    paths = numpy.array(weights, dtype=float)
+    through = numpy.empty_like(paths)
+    for k in range(len(paths)):
+        numpy.minimum(paths[:, k, numpy.newaxis], paths[k], out=through)
+        numpy.maximum(paths, through, out=paths)
+    return paths
+
+
+# Given a CxC boolean adjacency matrix, return the matrix of which candidates
+# can reach which others, by repeatedly squaring the adjacency matrix
+def reachability(adjacency):
+    reachable = numpy.array(adjacency, dtype=bool)
+    while True:
+        extended = reachable | (numpy.dot(reachable.astype(float), reachable.astype(float)) > 0)
+        if (extended == reachable).all():
+            return reachable
+        reachable = extended
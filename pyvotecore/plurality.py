@@ -4,5 +4,5 @@ from plurality_at_large import PluralityAtLarge
 
 class Plurality(AbstractSingleWinnerVotingSystem):
 
-    def __init__(self, ballots, tie_breaker=None):
-        super(Plurality, self).__init__(ballots, PluralityAtLarge, tie_breaker=tie_breaker)
+    def __init__(self, ballots, tie_breaker=None, aggregate=True):
+        super(Plurality, self).__init__(ballots, PluralityAtLarge, tie_breaker=tie_breaker, aggregate=aggregate)
@@ -15,37 +15,24 @@
 
 from abstract_classes import MultipleWinnerVotingSystem
 from common_functions import matching_keys
+from ballot_store import BallotStore
 import types
 import copy
+import numpy
 
 
 class PluralityAtLarge(MultipleWinnerVotingSystem):
 
-    def __init__(self, ballots, tie_breaker=None, required_winners=1):
-        super(PluralityAtLarge, self).__init__(ballots, tie_breaker=tie_breaker, required_winners=required_winners)
+    def __init__(self, ballots, tie_breaker=None, required_winners=1, aggregate=True):
+        super(PluralityAtLarge, self).__init__(ballots, tie_breaker=tie_breaker, required_winners=required_winners, aggregate=aggregate)
 
     def calculate_results(self):
 
-        # Standardize the ballot format and extract the candidates
-        self.candidates = set()
-        for ballot in self.ballots:
-
-            # Convert single candidate ballots into ballot lists
-            if type(ballot["ballot"]) != types.ListType:
-                ballot["ballot"] = [ballot["ballot"]]
-
-            # Ensure no ballot has an excess of votes
-            if len(ballot["ballot"]) > self.required_winners:
-                raise Exception("A ballot contained too many candidates")
-
-            # Add all candidates on the ballot to the set
-            self.candidates.update(set(ballot["ballot"]))
-
-        # Sum up all votes for each candidate
-        self.tallies = dict.fromkeys(self.candidates, 0)
-        for ballot in self.ballots:
-            for candidate in ballot["ballot"]:
-                self.tallies[candidate] += ballot["count"]
+        # Ballot stores can be tallied column-wise
+        if isinstance(self.ballots, BallotStore):
+            self.tally_ballot_store()
+        else:
+            self.tally_ballots()
         tallies = copy.deepcopy(self.tallies)
 
         # Determine which candidates win
@@ -69,6 +56,39 @@ class PluralityAtLarge(MultipleWinnerVotingSystem):
 
         self.winners = winning_candidates
 
+    def tally_ballots(self):
+
+        # Standardize the ballot format and extract the candidates
+        self.candidates = set()
+        for ballot in self.ballots:
+
+            # Ensure no ballot has an excess of votes
+            if len(self.ballot_candidates(ballot)) > self.required_winners:
+                raise Exception("A ballot contained too many candidates")
+
+            # Add all candidates on the ballot to the set
+            self.candidates.update(set(self.ballot_candidates(ballot)))
+
+        # Sum up all votes for each candidate
+        self.tallies = dict.fromkeys(self.candidates, 0)
+        for ballot in self.ballots:
+            for candidate in self.ballot_candidates(ballot):
+                self.tallies[candidate] += ballot["count"]
+
+    # Single candidate ballots are read as ballot lists
+    @staticmethod
+    def ballot_candidates(ballot):
+        if type(ballot["ballot"]) != types.ListType:
+            return [ballot["ballot"]]
+        return ballot["ballot"]
+
+    def tally_ballot_store(self):
+        marked = self.ballots.marked()
+        if (marked.sum(axis=1) > self.required_winners).any():
+            raise Exception("A ballot contained too many candidates")
+        self.candidates = set(self.ballots.candidates)
+        self.tallies = dict(zip(self.ballots.candidates, numpy.dot(self.ballots.weights, marked).tolist()))
+
     def as_dict(self):
         data = super(PluralityAtLarge, self).as_dict()
         data["tallies"] = self.tallies
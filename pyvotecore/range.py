@@ -1,19 +1,18 @@
 from __future__ import division
 from abstract_classes import SingleWinnerVotingSystem
+from ballot_store import BallotStore
+import numpy
 
 class Range(SingleWinnerVotingSystem):
 
-    def __init__(self, ballots):
-        super(Range, self).__init__(ballots)
+    def __init__(self, ballots, aggregate=True):
+        super(Range, self).__init__(ballots, aggregate=aggregate)
 
     def calculate_results(self):
-        candidates = {}
-        for ballot in self.ballots:
-            for candidate, score in ballot["ballot"].iteritems():
-                if candidate not in candidates:
-                    candidates[candidate] = CandidateResult(candidate)
-                candidates[candidate].sum_score += score * ballot["count"]
-                candidates[candidate].votes += ballot["count"]
+        if isinstance(self.ballots, BallotStore):
+            candidates = self.tally_ballot_store()
+        else:
+            candidates = self.tally_ballots()
         self.candidates = set(candidates.keys())
         self.results = sorted(candidates.values(), key=lambda cr: cr.avg_score, reverse=True)
         
@@ -31,6 +30,26 @@ class Range(SingleWinnerVotingSystem):
         else:
             self.winner = self.break_ties([result.name for result in tied_results])
 
+    def tally_ballots(self):
+        candidates = {}
+        for ballot in self.ballots:
+            for candidate, score in ballot["ballot"].iteritems():
+                if candidate not in candidates:
+                    candidates[candidate] = CandidateResult(candidate)
+                candidates[candidate].sum_score += score * ballot["count"]
+                candidates[candidate].votes += ballot["count"]
+        return candidates
+
+    def tally_ballot_store(self):
+        marked = self.ballots.marked()
+        weights = self.ballots.weights
+        sum_scores = numpy.dot(weights, numpy.where(marked, self.ballots.ratings, 0)).tolist()
+        votes = numpy.dot(weights, marked).tolist()
+        return dict(
+            (candidate, CandidateResult(candidate, sum_scores[i], votes[i]))
+            for i, candidate in enumerate(self.ballots.candidates)
+        )
+
     def as_dict(self):
         data = super(Range, self).as_dict()
         data["results"] = [str(result) for result in self.results]
@@ -15,54 +15,81 @@
 
 from condorcet import CondorcetSystem, CondorcetHelper
 from pygraph.classes.digraph import digraph
-from pygraph.algorithms.accessibility import accessibility, mutual_accessibility
-from pygraph.algorithms.cycles import find_cycle
-from common_functions import matching_keys
-from copy import deepcopy
 
 
 # This class implements the Schulze Method (aka the beatpath method)
 class RankedPairs(CondorcetSystem, CondorcetHelper):
 
-    def __init__(self, ballots, tie_breaker=None, ballot_notation=None):
-        super(RankedPairs, self).__init__(ballots, tie_breaker=tie_breaker, ballot_notation=ballot_notation)
+    def __init__(self, ballots, tie_breaker=None, ballot_notation=None, aggregate=True):
+        super(RankedPairs, self).__init__(ballots, tie_breaker=tie_breaker, ballot_notation=ballot_notation, aggregate=aggregate)
 
     def condorcet_completion_method(self):
 
-        # Initialize the candidate graph
-        self.rounds = []
-        graph = digraph()
-        graph.add_nodes(self.candidates)
+        # Track which candidates each candidate reaches (and is reached by)
+        # through the locked pairs, as bitsets indexed by candidate
+        candidates = list(self.candidates)
+        index = dict((candidate, i) for i, candidate in enumerate(candidates))
+        descendants = [1 << i for i in range(len(candidates))]
+        ancestors = [1 << i for i in range(len(candidates))]
+        locked_pairs = []
 
-        # Loop until we've considered all possible pairs
-        remaining_strong_pairs = deepcopy(self.strong_pairs)
-        while len(remaining_strong_pairs) > 0:
-            r = {}
+        # Group the pairs by strength, and consider them from strongest to weakest
+        pairs_by_strength = {}
+        for pair, strength in self.strong_pairs.iteritems():
+            pairs_by_strength.setdefault(strength, set()).add(pair)
+        self.rounds = []
+        for strength in sorted(pairs_by_strength.keys(), reverse=True):
 
-            # Find the strongest pair
-            largest_strength = max(remaining_strong_pairs.values())
-            strongest_pairs = matching_keys(remaining_strong_pairs, largest_strength)
-            if len(strongest_pairs) > 1:
-                r["tied_pairs"] = strongest_pairs
-                strongest_pair = self.break_ties(strongest_pairs)
-            else:
-                strongest_pair = list(strongest_pairs)[0]
-            r["pair"] = strongest_pair
+            # Tied pairs are taken in the order the tie breaker prefers them
+            tied_pairs = list(pairs_by_strength[strength])
+            if len(tied_pairs) > 1:
+                tied_pairs = self.order_ties(tied_pairs)
+            for i, strongest_pair in enumerate(tied_pairs):
+                r = {}
+                if i < len(tied_pairs) - 1:
+                    r["tied_pairs"] = set(tied_pairs[i:])
+                r["pair"] = strongest_pair
 
-            # If the pair would add a cycle, skip it
-            graph.add_edge(strongest_pair)
-            if len(find_cycle(graph)) > 0:
-                r["action"] = "skipped"
-                graph.del_edge(strongest_pair)
-            else:
-                r["action"] = "added"
-            del remaining_strong_pairs[strongest_pair]
-            self.rounds.append(r)
+                # If the pair would add a cycle (the loser already reaches the
+                # winner), skip it
+                winner, loser = index[strongest_pair[0]], index[strongest_pair[1]]
+                if descendants[loser] >> winner & 1:
+                    r["action"] = "skipped"
+                else:
+                    r["action"] = "added"
+                    locked_pairs.append(strongest_pair)
+                    self.lock_pair(winner, loser, descendants, ancestors)
+                self.rounds.append(r)
 
+        graph = digraph()
+        graph.add_nodes(self.candidates)
+        for pair in locked_pairs:
+            graph.add_edge(pair)
         self.old_graph = self.graph
         self.graph = graph
         self.graph_winner()
 
+    # Everything that reaches the winner now reaches everything the loser
+    # reaches. Candidates that already reached the loser are unaffected.
+    @staticmethod
+    def lock_pair(winner, loser, descendants, ancestors):
+        if descendants[winner] >> loser & 1:
+            return
+        updated = ancestors[winner]
+        while updated:
+            bit = updated & -updated
+            updated ^= bit
+            i = bit.bit_length() - 1
+            if not descendants[i] >> loser & 1:
+                descendants[i] |= descendants[loser]
+        updated = descendants[loser]
+        while updated:
+            bit = updated & -updated
+            updated ^= bit
+            i = bit.bit_length() - 1
+            if not ancestors[i] >> winner & 1:
+                ancestors[i] |= ancestors[winner]
+
     def as_dict(self):
         data = super(RankedPairs, self).as_dict()
         if hasattr(self, 'rounds'):
@@ -22,9 +22,9 @@ from pygraph.classes.digraph import digraph
 # This class provides Schulze Method results, but bypasses ballots and uses preference tallies instead.
 class SchulzeMethodByGraph(SchulzeMethod):
 
-    def __init__(self, edges, tie_breaker=None, ballot_notation=None):
+    def __init__(self, edges, tie_breaker=None, ballot_notation=None, aggregate=True):
         self.edges = edges
-        super(SchulzeMethodByGraph, self).__init__([], tie_breaker=tie_breaker, ballot_notation=ballot_notation)
+        super(SchulzeMethodByGraph, self).__init__([], tie_breaker=tie_breaker, ballot_notation=ballot_notation, aggregate=aggregate)
 
     def standardize_ballots(self, ballots, ballot_notation):
         self.ballots = []
@@ -42,13 +42,14 @@ class SchulzeMethodByGraph(SchulzeMethod):
 
 class SchulzeNPRByGraph(AbstractOrderingVotingSystem, SchulzeHelper):
 
-    def __init__(self, edges, winner_threshold=None, tie_breaker=None, ballot_notation=None):
+    def __init__(self, edges, winner_threshold=None, tie_breaker=None, ballot_notation=None, aggregate=True):
         self.edges = edges
         self.candidates = set([edge[0] for edge, weight in edges.iteritems()]) | set([edge[1] for edge, weight in edges.iteritems()])
         super(SchulzeNPRByGraph, self).__init__([],
             single_winner_class=SchulzeMethodByGraph,
             winner_threshold=winner_threshold,
             tie_breaker=tie_breaker,
+            aggregate=aggregate,
         )
 
     def ballots_without_candidate(self, ballots, candidate):
@@ -16,13 +16,16 @@
 from schulze_helper import SchulzeHelper
 from condorcet import CondorcetSystem
 
-# This class implements the Schulze Method (aka the beatpath method)
+# This class implements the Schulze Method (aka the beatpath method). With
+# engine="widest_path", the Schwartz set heuristic is replayed from a single
+# strongest path computation, which is much faster for many candidates.
 
 
 class SchulzeMethod(CondorcetSystem, SchulzeHelper):
 
-    def __init__(self, ballots, tie_breaker=None, ballot_notation=None):
-        super(SchulzeMethod, self).__init__(ballots, tie_breaker=tie_breaker, ballot_notation=ballot_notation)
+    def __init__(self, ballots, tie_breaker=None, ballot_notation=None, aggregate=True, engine="schwartz_set_heuristic"):
+        self.engine = engine
+        super(SchulzeMethod, self).__init__(ballots, tie_breaker=tie_breaker, ballot_notation=ballot_notation, aggregate=aggregate)
 
     def as_dict(self):
         data = super(SchulzeMethod, self).as_dict()
@@ -16,23 +16,95 @@
 from abstract_classes import AbstractOrderingVotingSystem
 from schulze_helper import SchulzeHelper
 from schulze_method import SchulzeMethod
+from ballot_store import BallotStore
+from pairwise import UNRANKED, reachability, strongest_paths
+from tie_breaker import TieBreaker
+import numpy
 
-#
+# This class implements Schulze NPR by electing the Schulze winner, removing
+# them from the ballots and repeating. With engine="widest_path", the whole
+# ordering is derived from a single pairwise matrix instead of re-running
+# SchulzeMethod on the remaining ballots for every position.
 
 
 class SchulzeNPR(AbstractOrderingVotingSystem, SchulzeHelper):
 
-    def __init__(self, ballots, winner_threshold=None, tie_breaker=None, ballot_notation=None):
+    def __init__(self, ballots, winner_threshold=None, tie_breaker=None, ballot_notation=None, aggregate=True, engine="schwartz_set_heuristic"):
+        self.engine = engine
         self.standardize_ballots(ballots, ballot_notation)
         super(SchulzeNPR, self).__init__(self.ballots,
             single_winner_class=SchulzeMethod,
             winner_threshold=winner_threshold,
             tie_breaker=tie_breaker,
+            aggregate=aggregate,
         )
 
+    def calculate_results(self):
+        if self.engine == "schwartz_set_heuristic":
+            return super(SchulzeNPR, self).calculate_results()
+        elif self.engine != "widest_path":
+            raise Exception("Unknown engine specified")
+
+        # Removing a candidate leaves the pairwise tallies between the other
+        # candidates unchanged, so one matrix serves every round
+        candidates = list(self.candidates)
+        wins = self.ballots_into_matrix(candidates, self.ballots)
+        weights = numpy.where(wins > wins.T, wins, UNRANKED)
+        remaining = numpy.ones(len(candidates), dtype=bool)
+        self.order = []
+        self.rounds = []
+        while remaining.sum() > 1 and (self.winner_threshold == None or len(self.order) < self.winner_threshold):
+
+            # Given the remaining candidates, who should win?
+            r = {}
+            ids = remaining.nonzero()[0]
+            winners = self.strong_pair_winners(weights[numpy.ix_(ids, ids)])
+            winners = set(candidates[i] for i in ids[winners].tolist())
+            if len(winners) > 1:
+                r['tied_winners'] = winners
+                if self.tie_breaker == None:
+                    self.tie_breaker = TieBreaker(set(candidates[i] for i in ids.tolist()))
+                r['winner'] = self.break_ties(winners)
+            else:
+                r['winner'] = list(winners)[0]
+
+            # Mark the candidate that won and remove them from the remaining candidates
+            self.order.append(r['winner'])
+            self.rounds.append(r)
+            remaining[candidates.index(r['winner'])] = False
+
+        # Note the last remaining candidate
+        if remaining.any() and (self.winner_threshold == None or len(self.order) < self.winner_threshold):
+            r = {'winner': candidates[remaining.nonzero()[0][0]]}
+            self.order.append(r['winner'])
+            self.rounds.append(r)
+
+    # Given a matrix of strong pair weights, return the indices of the
+    # candidates that graph_winner would consider winners: those nobody
+    # beats or, failing that, those the Schwartz set heuristic leaves. The
+    # latter are the candidates x with paths[x][y] >= paths[y][x] for every
+    # other y. Strongest paths between members of the Schwartz set never
+    # leave it, so they are only computed within it.
+    @staticmethod
+    def strong_pair_winners(weights):
+        edges = weights > UNRANKED
+        unbeaten = ~edges.any(axis=0)
+        if unbeaten.any():
+            return unbeaten.nonzero()[0]
+        reachable = reachability(edges)
+        schwartz_set = (~(reachable.T & ~reachable).any(axis=1)).nonzero()[0]
+        paths = strongest_paths(weights[numpy.ix_(schwartz_set, schwartz_set)])
+        return schwartz_set[(paths >= paths.T).all(axis=1)]
+
     @staticmethod
     def ballots_without_candidate(ballots, candidate):
-        for ballot in ballots:
-            if candidate in ballot['ballot']:
-                del ballot['ballot'][candidate]
-        return ballots
+        if isinstance(ballots, BallotStore):
+            return ballots.without_candidates([candidate])
+        return [
+            dict(ballot, ballot=dict(
+                (other_candidate, rating)
+                for other_candidate, rating in ballot['ballot'].iteritems()
+                if other_candidate != candidate
+            )) if candidate in ballot['ballot'] else ballot
+            for ballot in ballots
+        ]
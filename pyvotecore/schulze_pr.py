@@ -14,19 +14,34 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 # This class implements the Schulze Proportional Ranking Method as defined
-# in schulze2.pdf
-from schulze_helper import SchulzeHelper
+# in schulze2.pdf. Progress is reported at the start of each round and after
+# each pair of candidates.
+#
+# Every pair compared in round k rates the candidates against the k - 1
+# already elected, so each candidate's ballots are kept grouped by how they
+# rate it against those candidates (see elected_groups). A round then only
+# tallies the groups against each other candidate, and electing a candidate
+# splits the groups by one more rating instead of reading every ballot again.
+from schulze_helper import SchulzeHelper, completion_cost
 from abstract_classes import OrderingVotingSystem
 from pygraph.classes.digraph import digraph
+import numpy
 
 
 class SchulzePR(OrderingVotingSystem, SchulzeHelper):
 
-    def __init__(self, ballots, tie_breaker=None, winner_threshold=None, ballot_notation=None):
+    def __init__(self, ballots, tie_breaker=None, winner_threshold=None, ballot_notation=None, aggregate=True, vote_management=None, max_cost=None, progress=None, deadline=None, cancel=None):
+        self.progress = progress
+        self.deadline = deadline
+        self.cancel = cancel
+        self.vote_management = vote_management
         self.standardize_ballots(ballots, ballot_notation)
+        if max_cost != None:
+            self.check_cost(SchulzePR.cost(len(self.candidates), len(self.ballots), winner_threshold), max_cost)
         super(SchulzePR, self).__init__(self.ballots,
             tie_breaker=tie_breaker,
             winner_threshold=winner_threshold,
+            aggregate=aggregate,
         )
 
     def calculate_results(self):
@@ -34,6 +49,8 @@ class SchulzePR(OrderingVotingSystem, SchulzeHelper):
         remaining_candidates = self.candidates.copy()
         self.order = []
         self.rounds = []
+        self.reset_vote_management_diagnostics()
+        self.start_elected_groups(remaining_candidates)
 
         if self.winner_threshold == None:
             winner_threshold = len(self.candidates)
@@ -41,6 +58,7 @@ class SchulzePR(OrderingVotingSystem, SchulzeHelper):
             winner_threshold = min(len(self.candidates), self.winner_threshold + 1)
 
         for self.required_winners in range(1, winner_threshold):
+            self.report_progress("rounds", len(self.order), winner_threshold - 1)
 
             # Generate the list of patterns we need to complete
             self.generate_completed_patterns()
@@ -53,13 +71,18 @@ class SchulzePR(OrderingVotingSystem, SchulzeHelper):
             self.tied_winners = set([])
 
             # Generate the edges between nodes
+            pair_count = len(remaining_candidates) * (len(remaining_candidates) - 1)
+            done = 0
             for candidate_from in remaining_candidates:
                 other_candidates = sorted(list(remaining_candidates - set([candidate_from])))
-                for candidate_to in other_candidates:
-                    completed = self.proportional_completion(candidate_from, set([candidate_to]) | set(self.order))
+                tallies = self.elected_group_tallies(candidate_from, other_candidates)
+                for index, candidate_to in enumerate(other_candidates):
+                    completed = self.elected_group_completion(candidate_from, candidate_to, [tally[:, index] for tally in tallies])
                     weight = self.strength_of_vote_management(completed)
                     if weight > 0:
                         self.graph.add_edge((candidate_to, candidate_from), weight)
+                    done += 1
+                    self.report_progress("pairs", done, pair_count)
 
             # Determine the round winner through the Schwartz set heuristic
             self.schwartz_set_heuristic()
@@ -71,6 +94,7 @@ class SchulzePR(OrderingVotingSystem, SchulzeHelper):
                 round["tied_winners"] = self.tied_winners
             self.rounds.append(round)
             remaining_candidates -= set([self.winner])
+            self.split_elected_groups(self.winner)
             del self.winner
             del self.actions
             if hasattr(self, 'tied_winners'):
@@ -82,8 +106,86 @@ class SchulzePR(OrderingVotingSystem, SchulzeHelper):
             self.order.append(list(remaining_candidates)[0])
 
         del self.winner_threshold
+        del self.elected_groups
+
+    # For each remaining candidate, elected_groups holds the group of each
+    # ballot and the digits of each group against the elected candidates, in
+    # the order they were elected. Before any election there is one group.
+    def start_elected_groups(self, candidates):
+        ballot_ids, relations, counts = self.completion_relations()
+        self.elected_groups = dict(
+            (candidate, (numpy.zeros(len(counts), dtype=int), numpy.zeros((1, 0), dtype=int)))
+            for candidate in candidates
+        )
+
+    def split_elected_groups(self, winner):
+        ballot_ids, relations, counts = self.completion_relations()
+        del self.elected_groups[winner]
+        for candidate, (ballot_groups, digits) in self.elected_groups.items():
+            keys = ballot_groups * 3 + relations[ballot_ids[candidate]][:, ballot_ids[winner]]
+            groups, ballot_groups = numpy.unique(keys, return_inverse=True)
+            self.elected_groups[candidate] = (ballot_groups, numpy.column_stack([digits[groups // 3], groups % 3]))
+
+    # Tallies the ballots of a candidate against all the others at once.
+    # Entry [g, i, d] of the weights holds the voters in group g giving the
+    # digit d to others[i], and that of first the first of their ballots (or
+    # the number of ballots, if there are none). Voters are added up ballot by
+    # ballot, just as proportional completion adds them up.
+    def elected_group_tallies(self, candidate, others):
+        ballot_ids, relations, counts = self.completion_relations()
+        ballot_groups, digits = self.elected_groups[candidate]
+        keys = (ballot_groups[:, numpy.newaxis] * len(others) + numpy.arange(len(others))) * 3
+        keys += relations[ballot_ids[candidate]][:, [ballot_ids[other] for other in others]]
+        size = len(digits) * len(others) * 3
+        weights = numpy.bincount(keys.ravel(), weights=numpy.repeat(counts, len(others)), minlength=size)
+        first = numpy.empty(size, dtype=int)
+        first.fill(len(counts))
+        bins, index = numpy.unique(keys.ravel(), return_index=True)
+        first[bins] = index // len(others)
+        return weights.reshape(-1, len(others), 3), first.reshape(-1, len(others), 3)
+
+    # Completes the comparison of candidate_to with candidate_from from its
+    # group tallies, positioning the candidates as proportional_completion
+    # would have
+    def elected_group_completion(self, candidate_from, candidate_to, tallies):
+        other_candidates = list(set([candidate_to]) | set(self.order))
+        powers = 3 ** numpy.arange(len(other_candidates))
+        positions = dict((candidate, position) for position, candidate in enumerate(other_candidates))
+        ballot_groups, digits = self.elected_groups[candidate_from]
+        codes = digits.dot(powers[[positions[candidate] for candidate in self.order]])
+        patterns = (codes[:, numpy.newaxis] + numpy.arange(3) * powers[positions[candidate_to]]).ravel()
+        weights, first = tallies[0].ravel(), tallies[1].ravel()
+        seen = numpy.flatnonzero(first < len(ballot_groups))
+        seen = seen[numpy.argsort(first[seen], kind="mergesort")]
+        return self.complete_ballot_patterns(patterns[seen], weights[seen], powers)
+
+    # Estimates the work of an election without counting it (see
+    # schulze_helper.completion_cost)
+    @staticmethod
+    def estimate_cost(ballots, winner_threshold=None, ballot_notation=None):
+        helper = SchulzeHelper()
+        helper.standardize_ballots(ballots, ballot_notation)
+        return SchulzePR.cost(len(helper.candidates), len(helper.ballots), winner_threshold)
+
+    # Round k compares every pair of the candidates not yet elected
+    @staticmethod
+    def cost(candidate_count, ballot_count, winner_threshold=None):
+        if winner_threshold == None:
+            rounds = candidate_count
+        else:
+            rounds = min(candidate_count, winner_threshold + 1)
+        pairs = [(candidate_count - k + 1) * (candidate_count - k) for k in range(1, rounds)]
+        return completion_cost(
+            candidate_count,
+            ballot_count,
+            [(pairs[k - 1], k) for k in range(1, rounds)],
+            graph_nodes=candidate_count,
+            graph_edges=max(pairs + [0]),
+        )
 
     def as_dict(self):
         data = super(SchulzePR, self).as_dict()
         data["rounds"] = self.rounds
+        if self.vote_management != None:
+            data["vote_management"] = self.vote_management_diagnostics
         return data
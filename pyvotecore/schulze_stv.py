@@ -13,18 +13,57 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-# This class implements Schulze STV, a proportional representation system
+# This class implements Schulze STV, a proportional representation system.
+# Each set of required_winners + 1 candidates yields its edges of the graph
+# of possible winners independently, so with workers=n those sets are shared
+# out over a pool of n processes. Every worker receives the election once
+# when it starts, and the edges come back in the same order as a serial run.
+# The graph numbers the candidate sets rather than holding them as tuples
+# (see candidate_set_graph). Progress is reported after each candidate set
+# and before each step of the Schwartz set heuristic.
+#
+# Generating the edges can take hours, so with checkpoint=path the edges
+# found so far are saved every checkpoint_interval seconds, when the last
+# candidate set is done and when the count stops early. A later count of the
+# same election with resume_from=path picks up after the last candidate set
+# saved (or starts afresh if there is no such file yet) and ends up with the same graph as an uninterrupted run. A checkpoint
+# file is a header (CHECKPOINT_HEADER) followed by the raw edge arrays.
 from abstract_classes import MultipleWinnerVotingSystem
-from schulze_helper import SchulzeHelper
-from pygraph.classes.digraph import digraph
+from schulze_helper import SchulzeHelper, completion_cost
+from candidate_set_graph import CandidateSetGraph
+from common_functions import combinations_count
+import array
+import copy
+import hashlib
 import itertools
+import multiprocessing
+import os
+import struct
+import time
+
+CHECKPOINT_MAGIC = "PVCSTV1\n"
+
+# Magic, candidate sets done, edges, election fingerprint, vote management
+# strengths, iterations and saved iterations, and the size of an edge node
+# number in bytes
+CHECKPOINT_HEADER = struct.Struct("<8sQQ20sQQQB")
 
 
 class SchulzeSTV(MultipleWinnerVotingSystem, SchulzeHelper):
 
-    def __init__(self, ballots, tie_breaker=None, required_winners=1, ballot_notation=None):
+    def __init__(self, ballots, tie_breaker=None, required_winners=1, ballot_notation=None, aggregate=True, workers=None, vote_management=None, max_cost=None, progress=None, deadline=None, cancel=None, checkpoint=None, checkpoint_interval=300, resume_from=None):
+        self.checkpoint = checkpoint
+        self.checkpoint_interval = checkpoint_interval
+        self.resume_from = resume_from
+        self.progress = progress
+        self.deadline = deadline
+        self.cancel = cancel
+        self.workers = workers
+        self.vote_management = vote_management
         self.standardize_ballots(ballots, ballot_notation)
-        super(SchulzeSTV, self).__init__(self.ballots, tie_breaker=tie_breaker, required_winners=required_winners)
+        if max_cost != None:
+            self.check_cost(SchulzeSTV.cost(len(self.candidates), len(self.ballots), required_winners), max_cost)
+        super(SchulzeSTV, self).__init__(self.ballots, tie_breaker=tie_breaker, required_winners=required_winners, aggregate=aggregate)
 
     def calculate_results(self):
 
@@ -34,23 +73,38 @@ class SchulzeSTV(MultipleWinnerVotingSystem, SchulzeHelper):
             return
 
         # Generate the list of patterns we need to complete
+        self.reset_vote_management_diagnostics()
         self.generate_completed_patterns()
         self.generate_vote_management_graph()
 
         # Build the graph of possible winners
-        self.graph = digraph()
-        for candidate_set in itertools.combinations(self.candidates, self.required_winners):
-            self.graph.add_nodes([tuple(sorted(list(candidate_set)))])
+        self.graph = CandidateSetGraph(self.candidates, self.required_winners)
 
         # Generate the edges between nodes
-        for candidate_set in itertools.combinations(self.candidates, self.required_winners + 1):
-            for candidate in candidate_set:
-                other_candidates = sorted(set(candidate_set) - set([candidate]))
-                completed = self.proportional_completion(candidate, other_candidates)
-                weight = self.strength_of_vote_management(completed)
-                if weight > 0:
-                    for subset in itertools.combinations(other_candidates, len(other_candidates) - 1):
-                        self.graph.add_edge((tuple(other_candidates), tuple(sorted(list(subset) + [candidate]))), weight)
+        candidate_sets = itertools.combinations(self.graph.candidates, self.required_winners + 1)
+        candidate_set_count = combinations_count(len(self.candidates), self.required_winners + 1)
+        completed = 0
+        if self.resume_from != None and os.path.exists(self.resume_from):
+            completed = self.load_checkpoint(self.resume_from, candidate_set_count)
+            candidate_sets = itertools.islice(candidate_sets, completed, None)
+        completed_edges = self.graph.edge_count()
+        self.report_progress("candidate_sets", completed, candidate_set_count)
+        saved = time.time()
+
+        # Only the edges of whole candidate sets are saved, in case the count
+        # stops while a set's edges are being added
+        try:
+            for done, edges in enumerate(self.candidate_set_edges_in_order(candidate_sets), completed + 1):
+                self.graph.add_edges(edges)
+                completed, completed_edges = done, self.graph.edge_count()
+                if self.checkpoint != None and (done == candidate_set_count or time.time() - saved >= self.checkpoint_interval):
+                    self.save_checkpoint(self.checkpoint, done, completed_edges)
+                    saved = time.time()
+                self.report_progress("candidate_sets", done, candidate_set_count)
+        except:
+            if self.checkpoint != None and completed < candidate_set_count:
+                self.save_checkpoint(self.checkpoint, completed, completed_edges)
+            raise
 
         # Determine the winner through the Schwartz set heuristic
         self.graph_winner()
@@ -59,8 +113,145 @@ class SchulzeSTV(MultipleWinnerVotingSystem, SchulzeHelper):
         self.winners = set(self.winner)
         del self.winner
 
+    # Estimates the work of an election without counting it (see
+    # schulze_helper.completion_cost)
+    @staticmethod
+    def estimate_cost(ballots, required_winners=1, ballot_notation=None):
+        helper = SchulzeHelper()
+        helper.standardize_ballots(ballots, ballot_notation)
+        return SchulzeSTV.cost(len(helper.candidates), len(helper.ballots), required_winners)
+
+    @staticmethod
+    def cost(candidate_count, ballot_count, required_winners):
+        if required_winners >= candidate_count:
+            return completion_cost(candidate_count, ballot_count, [])
+        candidate_sets = combinations_count(candidate_count, required_winners + 1)
+        return completion_cost(
+            candidate_count,
+            ballot_count,
+            [(candidate_sets * (required_winners + 1), required_winners)],
+            graph_nodes=combinations_count(candidate_count, required_winners),
+            graph_edges=candidate_sets * (required_winners + 1) * required_winners,
+        )
+
+    # Identifies the election by everything the edges depend on. Leaving out
+    # vote_management counts iteratively, so both are fingerprinted alike.
+    def checkpoint_fingerprint(self):
+        ballot_ids, relations, weights = self.completion_relations()
+        vote_management = "iterative" if self.vote_management == None else self.vote_management
+        fingerprint = hashlib.sha1(repr((self.graph.candidates, self.required_winners, vote_management)))
+        fingerprint.update(relations.tostring())
+        fingerprint.update(weights.astype(float).tostring())
+        return fingerprint.digest()
+
+    # The checkpoint is written beside its path and then moved into place,
+    # so a crash while saving leaves the previous checkpoint intact
+    def save_checkpoint(self, path, done, edge_count):
+        with open(path + ".tmp", "wb") as output:
+            output.write(CHECKPOINT_HEADER.pack(
+                CHECKPOINT_MAGIC,
+                done,
+                edge_count,
+                self.checkpoint_fingerprint(),
+                self.vote_management_diagnostics["strengths"],
+                self.vote_management_diagnostics["iterations"],
+                self.vote_management_diagnostics["saved_iterations"],
+                array.array('l').itemsize,
+            ))
+            self.graph.write_edges(output, edge_count)
+            output.flush()
+            os.fsync(output.fileno())
+        os.rename(path + ".tmp", path)
+
+    # Restores the edges and diagnostics from a checkpoint, returning the
+    # number of candidate sets already done
+    def load_checkpoint(self, path, candidate_set_count):
+        with open(path, "rb") as input:
+            header = input.read(CHECKPOINT_HEADER.size)
+            if len(header) < CHECKPOINT_HEADER.size or header[:len(CHECKPOINT_MAGIC)] != CHECKPOINT_MAGIC:
+                raise Exception("Not a Schulze STV checkpoint")
+            magic, done, edge_count, fingerprint, strengths, iterations, saved_iterations, itemsize = CHECKPOINT_HEADER.unpack(header)
+            if itemsize != array.array('l').itemsize:
+                raise Exception("The checkpoint was written on an incompatible platform")
+            if fingerprint != self.checkpoint_fingerprint():
+                raise Exception("The checkpoint belongs to a different election")
+            if done > candidate_set_count:
+                raise Exception("The checkpoint has more candidate sets than the election")
+            self.graph.read_edges(input, edge_count)
+        self.vote_management_diagnostics = {"strengths": strengths, "iterations": iterations, "saved_iterations": saved_iterations}
+        return done
+
+    def candidate_set_edges(self, candidate_set):
+        edges = []
+        for candidate in candidate_set:
+            other_candidates = sorted(set(candidate_set) - set([candidate]))
+            completed = self.proportional_completion(candidate, other_candidates)
+            weight = self.strength_of_vote_management(completed)
+            if weight > 0:
+                source = self.graph.rank(other_candidates)
+                for subset in itertools.combinations(other_candidates, len(other_candidates) - 1):
+                    edges.append((source, self.graph.rank(list(subset) + [candidate]), weight))
+        return edges
+
+    def candidate_set_edges_in_order(self, candidate_sets):
+        if self.workers == None or self.workers <= 1:
+            for candidate_set in candidate_sets:
+                yield self.candidate_set_edges(candidate_set)
+            return
+
+        # Hand out candidate sets in chunks, keeping each worker busy a while
+        chunk_size = max(1, combinations_count(len(self.candidates), self.required_winners + 1) // (self.workers * 8))
+        pool = multiprocessing.Pool(self.workers, initializer=start_worker, initargs=(self.worker_election(),))
+        try:
+            for edges, diagnostics in pool.imap(worker_candidate_set_edges, candidate_sets, chunk_size):
+                for key, value in diagnostics.iteritems():
+                    self.vote_management_diagnostics[key] += value
+                yield edges
+            pool.close()
+        finally:
+            pool.terminate()
+            pool.join()
+
+    # Workers are given a copy of the election without the caller's progress
+    # callback and cancel event, which need not survive pickling when workers
+    # are not forked. The parent checks them as results arrive.
+    def worker_election(self):
+        election = copy.copy(self)
+        election.progress = None
+        election.deadline = None
+        election.cancel = None
+        return election
+
+    def graph_winner(self):
+        winning_candidates = self.graph.unbeaten_sets()
+        if len(winning_candidates) == 1:
+            self.winner = list(winning_candidates)[0]
+        elif len(winning_candidates) > 1:
+            self.tied_winners = winning_candidates
+            self.winner = self.break_ties(winning_candidates)
+        else:
+            self.actions = self.graph.schwartz_set_heuristic(lambda actions: self.report_progress("schwartz_set", actions))
+            self.graph_winner()
+
     def as_dict(self):
         data = super(SchulzeSTV, self).as_dict()
         if hasattr(self, 'actions'):
             data['actions'] = self.actions
+        if self.vote_management != None and hasattr(self, 'vote_management_diagnostics'):
+            data['vote_management'] = self.vote_management_diagnostics
         return data
+
+
+# Each worker process keeps its own copy of the election
+worker_election = None
+
+
+def start_worker(election):
+    global worker_election
+    worker_election = election
+
+
+# Along with the edges, report the diagnostics they added in the worker
+def worker_candidate_set_edges(candidate_set):
+    worker_election.reset_vote_management_diagnostics()
+    return worker_election.candidate_set_edges(candidate_set), worker_election.vote_management_diagnostics
@@ -0,0 +1,236 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from ballot_store import BallotStore
+from pairwise import truncated_pairwise_matrix
+from plurality_at_large import PluralityAtLarge
+from range import Range, CandidateResult
+from schulze_by_graph import SchulzeMethodByGraph
+import csv
+import itertools
+import json
+import numpy
+import types
+
+# Tallying an election usually needs the whole ballot list in memory. The
+# readers and accumulators below instead consume ballots a chunk at a time,
+# keeping only what each family of voting systems needs: the pairwise matrix
+# for Condorcet methods, per-candidate sums for range voting and vote tallies
+# for plurality at large.
+
+
+# This class reads ballots from a JSON Lines or CSV file (or any iterable of
+# ballots). A JSON line holds one {"count": n, "ballot": ...} object. A CSV
+# file has a header row naming the candidates and an optional "count" column;
+# each row rates or ranks the candidates, leaving unmarked candidates blank.
+# Readers opened on a file name can be iterated more than once.
+class BallotReader(object):
+
+    def __init__(self, source, file_format=None, chunk_size=10000):
+        self.source = source
+        self.chunk_size = chunk_size
+        self.file_format = file_format
+        if self.file_format == None and type(source) in types.StringTypes:
+            self.file_format = "csv" if source.lower().endswith(".csv") else "jsonl"
+
+    def __iter__(self):
+        if type(self.source) in types.StringTypes:
+            with open(self.source, "rb" if self.file_format == "csv" else "r") as lines:
+                for ballot in self.parse(lines):
+                    yield ballot
+        else:
+            for ballot in self.parse(self.source):
+                yield ballot
+
+    def parse(self, lines):
+        if self.file_format == "csv":
+            return self.parse_csv(lines)
+        elif self.file_format == "jsonl":
+            return self.parse_json_lines(lines)
+        elif self.file_format == None:
+            return iter(lines)
+        else:
+            raise Exception("Unknown file format specified")
+
+    @staticmethod
+    def parse_json_lines(lines):
+        for line in lines:
+            if line.strip():
+                yield json.loads(line)
+
+    @staticmethod
+    def parse_csv(lines):
+        rows = csv.reader(lines)
+        header = next(rows)
+        for row in rows:
+            ballot = {"count": 1, "ballot": {}}
+            for column, value in zip(header, row):
+                if value.strip() == "":
+                    continue
+                if column == "count":
+                    ballot["count"] = BallotReader.parse_number(value)
+                else:
+                    ballot["ballot"][column] = BallotReader.parse_number(value)
+            yield ballot
+
+    @staticmethod
+    def parse_number(value):
+        try:
+            return int(value)
+        except ValueError:
+            return float(value)
+
+    def chunks(self):
+        ballots = iter(self)
+        while True:
+            chunk = list(itertools.islice(ballots, self.chunk_size))
+            if len(chunk) == 0:
+                return
+            yield chunk
+
+
+# Feed every chunk of a reader (or an iterable of ballots) into an accumulator
+def accumulate(accumulator, ballots, chunk_size=10000):
+    if not isinstance(ballots, BallotReader):
+        ballots = BallotReader(ballots, chunk_size=chunk_size)
+    for chunk in ballots.chunks():
+        accumulator.update(chunk)
+    return accumulator
+
+
+# This class accumulates the pairwise preferences used by Condorcet methods.
+# Candidates may first appear in any chunk: every earlier ballot left them
+# unranked, so they are counted as losing to whatever those ballots ranked.
+class PairwiseAccumulator(object):
+
+    def __init__(self, ballot_notation=None):
+        self.ballot_notation = ballot_notation
+        self.candidates = []
+        self.candidate_ids = {}
+        self.wins = numpy.zeros((0, 0), dtype=int)
+        self.ranked_weights = numpy.zeros(0, dtype=int)
+
+    def update(self, ballots):
+        store = BallotStore.from_ballots(ballots, self.ballot_notation)
+        self.add_candidates(store.candidates)
+        if store.weights.dtype.kind not in "iu" and self.wins.dtype.kind in "iu":
+            self.wins = self.wins.astype(float)
+            self.ranked_weights = self.ranked_weights.astype(float)
+
+        ids = numpy.array([self.candidate_ids[candidate] for candidate in store.candidates], dtype=int)
+        ranked_weights = numpy.dot(store.weights, store.marked()).astype(self.wins.dtype)
+        self.wins[ids, :] += ranked_weights[:, numpy.newaxis]
+        self.wins[numpy.ix_(ids, ids)] += truncated_pairwise_matrix(store.ratings, store.weights) - ranked_weights[:, numpy.newaxis]
+        self.ranked_weights[ids] += ranked_weights
+
+    def add_candidates(self, candidates):
+        new_candidates = [candidate for candidate in candidates if candidate not in self.candidate_ids]
+        if len(new_candidates) == 0:
+            return
+        for candidate in new_candidates:
+            self.candidate_ids[candidate] = len(self.candidates)
+            self.candidates.append(candidate)
+
+        # Earlier ballots ranked every candidate they marked above the new ones
+        size = len(self.candidates)
+        wins = numpy.zeros((size, size), dtype=self.wins.dtype)
+        wins[:len(self.wins), :len(self.wins)] = self.wins
+        wins[:len(self.wins), len(self.wins):] = self.ranked_weights[:, numpy.newaxis]
+        self.wins = wins
+        self.ranked_weights = numpy.concatenate([self.ranked_weights, numpy.zeros(len(new_candidates), dtype=self.wins.dtype)])
+
+    def edges(self):
+        wins = self.wins.tolist()
+        return dict(
+            ((self.candidates[i], self.candidates[j]), wins[i][j])
+            for i, j in itertools.permutations(range(len(self.candidates)), 2)
+        )
+
+    def result(self, tie_breaker=None):
+        return SchulzeMethodByGraph(self.edges(), tie_breaker=tie_breaker)
+
+
+# This class accumulates the per-candidate score sums used by range voting
+class RangeAccumulator(object):
+
+    def __init__(self):
+        self.candidate_results = {}
+
+    def update(self, ballots):
+        for ballot in ballots:
+            count = ballot.get("count", 1)
+            for candidate, score in ballot["ballot"].iteritems():
+                if candidate not in self.candidate_results:
+                    self.candidate_results[candidate] = CandidateResult(candidate)
+                self.candidate_results[candidate].sum_score += score * count
+                self.candidate_results[candidate].votes += count
+
+    # Range voting breaks ties with a second look at the ballots, so pass a
+    # reader that can be iterated again if ties are a possibility
+    def result(self, ballots=None):
+        return RangeByTallies(self.candidate_results, ballots)
+
+
+# This class accumulates the vote tallies used by plurality at large
+class PluralityAccumulator(object):
+
+    def __init__(self, required_winners=1):
+        self.required_winners = required_winners
+        self.tallies = {}
+
+    def update(self, ballots):
+        for ballot in ballots:
+            candidates = ballot["ballot"]
+            if type(candidates) != types.ListType:
+                candidates = [candidates]
+            if len(candidates) > self.required_winners:
+                raise Exception("A ballot contained too many candidates")
+            for candidate in candidates:
+                self.tallies[candidate] = self.tallies.get(candidate, 0) + ballot.get("count", 1)
+
+    def result(self, tie_breaker=None):
+        return PluralityAtLargeByTallies(self.tallies, tie_breaker=tie_breaker, required_winners=self.required_winners)
+
+
+# This class provides range voting results, but bypasses ballots and uses
+# accumulated scores instead. Ballots are only read if a tie must be broken.
+class RangeByTallies(Range):
+
+    def __init__(self, candidate_results, ballots=None):
+        self.candidate_results = candidate_results
+        self.tie_breaking_ballots = ballots
+        super(RangeByTallies, self).__init__([], aggregate=False)
+
+    def tally_ballots(self):
+        return self.candidate_results
+
+    def break_ties(self, tied_candidates):
+        if self.tie_breaking_ballots == None:
+            raise Exception("Breaking a range voting tie requires the ballots")
+        self.ballots = self.tie_breaking_ballots
+        return super(RangeByTallies, self).break_ties(tied_candidates)
+
+
+# This class provides plurality at large results, but bypasses ballots and
+# uses accumulated tallies instead.
+class PluralityAtLargeByTallies(PluralityAtLarge):
+
+    def __init__(self, tallies, tie_breaker=None, required_winners=1):
+        self.accumulated_tallies = tallies
+        super(PluralityAtLargeByTallies, self).__init__([], tie_breaker=tie_breaker, required_winners=required_winners, aggregate=False)
+
+    def tally_ballots(self):
+        self.candidates = set(self.accumulated_tallies.keys())
+        self.tallies = dict(self.accumulated_tallies)
@@ -14,49 +14,79 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from abstract_classes import MultipleWinnerVotingSystem
+from ballot_store import BallotStore
+from ballot_trie import BallotTrie
 import math
-import copy
 from common_functions import matching_keys
+from decimal import Decimal
+import numpy
 
 # This class implements the Single Transferable vote (aka STV) in its most
 # classic form (see http://en.wikipedia.org/wiki/Single_transferable_vote).
 # Alternate counting methods such as Meek's and Warren's would be nice, but
 # would need to be covered in a separate class.
+#
+# The count itself is delegated to a ballot pool. The classic engine keeps a
+# preference list per ballot and rescans them all every round. With
+# engine="piles", each candidate instead holds a pile of the ballots it is
+# currently counted on, and electing or eliminating a candidate only moves
+# that candidate's pile. Both engines give identical results. Elections whose
+# ballots share long prefixes can use engine="trie" (see ballot_trie.py).
+#
+# With bulk_exclusion=True, a round that elects no one eliminates at once every
+# low candidate who would have been eliminated one after another anyway. Such
+# rounds record the whole batch as "losers", and the winners are unchanged.
+#
+# Floating point transfers can round differently from one machine to the
+# next. With engine="fixed_point", transfer values are instead truncated to
+# a fixed number of decimal places (precision) and the count runs on
+# integers, so recounts agree exactly.
+#
+# Progress is reported before every round.
 
 
 class STV(MultipleWinnerVotingSystem):
 
-    def __init__(self, ballots, tie_breaker=None, required_winners=1):
-        super(STV, self).__init__(ballots, tie_breaker=tie_breaker, required_winners=required_winners)
+    def __init__(self, ballots, tie_breaker=None, required_winners=1, aggregate=True, engine="classic", bulk_exclusion=False, precision=5, progress=None, deadline=None, cancel=None):
+        self.progress = progress
+        self.deadline = deadline
+        self.cancel = cancel
+        self.engine = engine
+        self.precision = precision
+        self.bulk_exclusion = bulk_exclusion
+        super(STV, self).__init__(ballots, tie_breaker=tie_breaker, required_winners=required_winners, aggregate=aggregate)
 
     def calculate_results(self):
 
+        # Counting transfers votes between ballots, so work on preference lists
+        if isinstance(self.ballots, BallotStore):
+            self.ballots = list(self.ballots.orderings())
+
+        self.ballots = [dict(ballot, count=float(ballot["count"])) for ballot in self.ballots]
         self.candidates = set()
         for ballot in self.ballots:
-            ballot["count"] = float(ballot["count"])
             self.candidates.update(set(ballot['ballot']))
 
         self.quota = STV.droop_quota(self.ballots, self.required_winners)
         self.rounds = []
         self.winners = set()
         quota = self.quota
-        remaining_candidates = copy.deepcopy(self.candidates)
-        ballots = copy.deepcopy(self.ballots)
+        remaining_candidates = set(self.candidates)
+        ballots = self.ballot_pool()
 
         # Loop until we have enough candidates
         while len(self.winners) < self.required_winners and len(remaining_candidates) + len(self.winners) > self.required_winners:
+            self.report_progress("rounds", len(self.rounds))
 
             # If all the votes have been used up, start from scratch for the remaining candidates
             round = {}
-            if len(filter(lambda ballot: ballot["count"] > 0, ballots)) == 0:
+            if not ballots.has_votes():
                 round["note"] = "reset"
-                ballots = copy.deepcopy(self.ballots)
-                for ballot in ballots:
-                    ballot["ballot"] = filter(lambda x: x in remaining_candidates, ballot["ballot"])
-                quota = STV.droop_quota(ballots, self.required_winners - len(self.winners))
+                ballots.reset(remaining_candidates)
+                quota = STV.droop_quota(self.ballots, self.required_winners - len(self.winners))
 
             # If any candidates meet or exceeds the quota, they're a winner
-            round["tallies"] = STV.tallies(ballots)
+            round["tallies"] = ballots.tallies()
             if max(round["tallies"].values()) >= quota:
 
                 # Collect candidates as winners
@@ -68,19 +98,23 @@ class STV(MultipleWinnerVotingSystem):
                 self.winners |= round["winners"]
                 remaining_candidates -= round["winners"]
 
-                # Redistribute excess votes
-                for ballot in ballots:
-                    if ballot["ballot"][0] in round["winners"]:
-                        ballot["count"] *= (round["tallies"][ballot["ballot"][0]] - self.quota) / round["tallies"][ballot["ballot"][0]]
-
-                # Remove candidates from remaining ballots
-                ballots = self.remove_candidates_from_ballots(round["winners"], ballots)
+                # Redistribute excess votes and remove the winners from the ballots
+                ballots.transfer_surplus(round["winners"], round["tallies"], self.quota)
+                ballots.remove_candidates(round["winners"])
 
             # If no candidate exceeds the quota, elimiate the least preferred
             else:
-                round.update(self.loser(round["tallies"]))
-                remaining_candidates.remove(round["loser"])
-                ballots = self.remove_candidates_from_ballots([round["loser"]], ballots)
+                losers = set()
+                if self.bulk_exclusion:
+                    losers = STV.bulk_losers(round["tallies"], remaining_candidates, quota, self.required_winners - len(self.winners))
+                if len(losers) > 1:
+                    round["losers"] = losers
+                    remaining_candidates -= losers
+                    ballots.remove_candidates(losers)
+                else:
+                    round.update(self.loser(round["tallies"]))
+                    remaining_candidates.remove(round["loser"])
+                    ballots.remove_candidates([round["loser"]])
 
             # Record this round's actions
             self.rounds.append(round)
@@ -98,6 +132,18 @@ class STV(MultipleWinnerVotingSystem):
             data["remaining_candidates"] = self.remaining_candidates
         return data
 
+    def ballot_pool(self):
+        if self.engine == "classic":
+            return BallotLists(self.ballots)
+        elif self.engine == "piles":
+            return BallotPiles(self.ballots)
+        elif self.engine == "trie":
+            return BallotTrie(self.ballots)
+        elif self.engine == "fixed_point":
+            return FixedPointPiles(self.ballots, self.precision)
+        else:
+            raise Exception("Unknown engine specified")
+
     def loser(self, tallies):
         losers = matching_keys(tallies, min(tallies.values()))
         if len(losers) == 1:
@@ -108,12 +154,41 @@ class STV(MultipleWinnerVotingSystem):
                 "loser": self.break_ties(losers, True)
             }
 
+    # The lowest candidates can be eliminated together when they hold fewer
+    # votes between them than the next candidate up, and handing all of them
+    # to the leader would still fall short of the quota. Eliminating them one
+    # at a time would then elect no one and pick them in some order, so the
+    # batch leaves the count exactly where those rounds would have. Candidates
+    # without votes are left out of tallies and could overtake a batch member
+    # along the way, so none may remain. The batch also leaves enough
+    # candidates to fill the remaining seats.
+    @staticmethod
+    def bulk_losers(tallies, remaining_candidates, quota, seats):
+        if set(tallies) != remaining_candidates:
+            return set()
+        candidates = sorted(tallies, key=tallies.get)
+        losers = set()
+        votes = 0
+        for i in range(min(len(candidates) - seats, len(candidates) - 1)):
+            votes += tallies[candidates[i]]
+            if tallies[candidates[-1]] + votes >= quota:
+                break
+            if votes < tallies[candidates[i + 1]]:
+                losers = set(candidates[:i + 1])
+        return losers
+
+    # Counting reweights ballots and replaces their preference lists, so it
+    # works on shallow copies. Preference lists are shared with self.ballots
+    # and must never be modified in place.
+    @staticmethod
+    def working_ballots(ballots):
+        return [dict(ballot) for ballot in ballots]
+
     @staticmethod
     def remove_candidates_from_ballots(candidates, ballots):
         for ballot in ballots:
-            for candidate in candidates:
-                if candidate in ballot["ballot"]:
-                    ballot["ballot"].remove(candidate)
+            if any(candidate in ballot["ballot"] for candidate in candidates):
+                ballot["ballot"] = [candidate for candidate in ballot["ballot"] if candidate not in candidates]
         return ballots
 
     @staticmethod
@@ -137,3 +212,198 @@ class STV(MultipleWinnerVotingSystem):
         for ballot in ballots:
             voters += ballot["count"]
         return int(math.floor(voters / (seats + 1)) + 1)
+
+
+# This class holds the ballots for the classic engine, as one preference list
+# per ballot from which elected and eliminated candidates are removed.
+class BallotLists(object):
+
+    def __init__(self, ballots):
+        self.ballots = ballots
+        self.working_ballots = STV.working_ballots(ballots)
+
+    def has_votes(self):
+        return any(ballot["count"] > 0 for ballot in self.working_ballots)
+
+    def reset(self, remaining_candidates):
+        self.working_ballots = STV.working_ballots(self.ballots)
+        for ballot in self.working_ballots:
+            ballot["ballot"] = filter(lambda x: x in remaining_candidates, ballot["ballot"])
+
+    def tallies(self):
+        return STV.tallies(self.working_ballots)
+
+    def transfer_surplus(self, winners, tallies, quota):
+        for ballot in self.working_ballots:
+            if len(ballot["ballot"]) > 0 and ballot["ballot"][0] in winners:
+                ballot["count"] *= (tallies[ballot["ballot"][0]] - quota) / tallies[ballot["ballot"][0]]
+
+    def remove_candidates(self, candidates):
+        STV.remove_candidates_from_ballots(candidates, self.working_ballots)
+
+
+# This class holds the ballots for the pile engine. All preference lists are
+# flattened into one array, and each ballot keeps a cursor to the candidate it
+# currently counts for. Each candidate has a pile of the ballots it holds;
+# removing a candidate advances the cursors of its pile only, skipping other
+# removed candidates, and spreads those ballots over the remaining piles.
+#
+# Tallies must match the classic engine exactly, which adds each pile up in
+# ballot order. While every ballot weight is a whole number any order gives
+# the same sum, so piles keep running totals and a round costs O(ballots
+# moved). Once a surplus transfer leaves fractional weights, any pile that
+# receives a ballot is sorted and re-added in ballot order, so from then on a
+# round costs O(size of the piles that changed) rather than O(ballots moved).
+# Every tally is reported in the round's results, so none can be skipped.
+class BallotPiles(object):
+
+    def __init__(self, ballots):
+        self.candidates = []
+        candidate_ids = {}
+        preferences = []
+        lengths = []
+        for ballot in ballots:
+            for candidate in ballot["ballot"]:
+                if candidate not in candidate_ids:
+                    candidate_ids[candidate] = len(self.candidates)
+                    self.candidates.append(candidate)
+                preferences.append(candidate_ids[candidate])
+            lengths.append(len(ballot["ballot"]))
+        self.candidate_ids = candidate_ids
+        self.preferences = numpy.array(preferences, dtype=int)
+        self.ends = numpy.cumsum(numpy.array(lengths, dtype=int))
+        self.starts = self.ends - numpy.array(lengths, dtype=int)
+        self.counts = self.ballot_weights(ballots)
+        self.removed = numpy.zeros(len(self.candidates), dtype=bool)
+        self.reset()
+
+    def ballot_weights(self, ballots):
+        return numpy.array([ballot["count"] for ballot in ballots], dtype=float)
+
+    def has_votes(self):
+        return self.positive_ballots > 0
+
+    # Sets the weights of some ballots, keeping count of the ballots whose
+    # weight is positive. As in the classic engine, a ballot that runs out of
+    # preferences keeps its weight, so only surplus transfers change it.
+    def set_weights(self, ballots, weights):
+        self.positive_ballots += numpy.count_nonzero(weights > 0) - numpy.count_nonzero(self.weights[ballots] > 0)
+        self.weights[ballots] = weights
+
+    # Removed candidates are already skipped by the cursors, so only the
+    # cursors and weights need to start over
+    def reset(self, remaining_candidates=None):
+        self.weights = self.counts.copy()
+        self.positive_ballots = numpy.count_nonzero(self.weights > 0)
+        self.whole_weights = bool(numpy.all(numpy.mod(self.weights, 1) == 0))
+        self.positions = self.starts.copy()
+        self.piles = [[] for candidate in self.candidates]
+        self.sums = [0] * len(self.candidates)
+        self.unsummed = set()
+        self.place(numpy.arange(len(self.weights)))
+
+    def tallies(self):
+        for candidate_id in self.unsummed:
+            pile = numpy.sort(numpy.concatenate(self.piles[candidate_id]))
+            self.piles[candidate_id] = [pile]
+            self.sums[candidate_id] = float(numpy.cumsum(self.weights[pile])[-1])
+        self.unsummed = set()
+        return dict(
+            (self.candidates[candidate_id], votes)
+            for candidate_id, votes in enumerate(self.sums)
+            if votes > 0 and not self.removed[candidate_id]
+        )
+
+    def transfer_surplus(self, winners, tallies, quota):
+        for winner in winners:
+            candidate_id = self.candidate_ids[winner]
+            if len(self.piles[candidate_id]) == 0:
+                continue
+            pile = numpy.concatenate(self.piles[candidate_id])
+            self.set_weights(pile, self.weights[pile] * ((tallies[winner] - quota) / tallies[winner]))
+            if self.whole_weights:
+                self.whole_weights = bool(numpy.all(numpy.mod(self.weights[pile], 1) == 0))
+
+    def remove_candidates(self, candidates):
+        moved = []
+        for candidate in candidates:
+            candidate_id = self.candidate_ids[candidate]
+            self.removed[candidate_id] = True
+            moved.extend(self.piles[candidate_id])
+            self.piles[candidate_id] = []
+            self.sums[candidate_id] = 0
+            self.unsummed.discard(candidate_id)
+        if len(moved) > 0:
+            self.place(numpy.concatenate(moved))
+
+    # Advance the cursors of the given ballots to their next remaining
+    # candidate and add each ballot to that candidate's pile
+    def place(self, ballots):
+        pending = ballots
+        while len(pending) > 0:
+            pending = pending[self.positions[pending] < self.ends[pending]]
+            pending = pending[self.removed[self.preferences[self.positions[pending]]]]
+            self.positions[pending] += 1
+
+        ballots = numpy.sort(ballots[self.positions[ballots] < self.ends[ballots]])
+        candidate_ids = self.preferences[self.positions[ballots]]
+        order = numpy.argsort(candidate_ids, kind="mergesort")
+        ballots, candidate_ids = ballots[order], candidate_ids[order]
+        bounds = numpy.flatnonzero(numpy.diff(candidate_ids)) + 1
+        for start, group in zip(numpy.concatenate([[0], bounds]), numpy.split(ballots, bounds)):
+            if len(group) == 0:
+                continue
+            candidate_id = candidate_ids[start]
+            self.piles[candidate_id].append(group)
+            if self.whole_weights:
+                self.sums[candidate_id] += numpy.sum(self.weights[group]).item()
+            else:
+                self.unsummed.add(candidate_id)
+
+
+# This class runs the pile engine on integers. Every ballot carries a
+# transfer value, starting at 1, held as an integer number of units of
+# 10^-precision. A surplus transfer multiplies the transfer values of the
+# winner's pile by (tally - quota) / tally, truncating both that fraction and
+# each product to whole units, as in the Scottish STV rules. Votes lost to
+# truncation are simply no longer counted. Tallies are exact integer sums and
+# are reported as Decimals with the chosen precision.
+#
+# Ballot counts must be whole numbers, and the number of voters times
+# 10^precision must fit in 63 bits (nine places allows a billion voters).
+class FixedPointPiles(BallotPiles):
+
+    def __init__(self, ballots, precision):
+        if any(ballot["count"] != int(ballot["count"]) for ballot in ballots):
+            raise Exception("Fixed point counting requires whole numbered ballot counts")
+        self.precision = precision
+        self.scale = 10 ** precision
+        if sum(int(ballot["count"]) for ballot in ballots) * self.scale >= 2 ** 63:
+            raise Exception("Too many voters for the fixed point precision")
+        self.multiplicities = numpy.array([int(ballot["count"]) for ballot in ballots], dtype=numpy.int64)
+        super(FixedPointPiles, self).__init__(ballots)
+
+    def ballot_weights(self, ballots):
+        return self.multiplicities * self.scale
+
+    def reset(self, remaining_candidates=None):
+        self.transfer_values = numpy.empty(len(self.multiplicities), dtype=numpy.int64)
+        self.transfer_values.fill(self.scale)
+        super(FixedPointPiles, self).reset(remaining_candidates)
+
+    def tallies(self):
+        return dict(
+            (candidate, Decimal(votes).scaleb(-self.precision))
+            for candidate, votes in super(FixedPointPiles, self).tallies().iteritems()
+        )
+
+    def transfer_surplus(self, winners, tallies, quota):
+        for winner in winners:
+            candidate_id = self.candidate_ids[winner]
+            if len(self.piles[candidate_id]) == 0:
+                continue
+            pile = numpy.concatenate(self.piles[candidate_id])
+            tally = self.sums[candidate_id]
+            fraction = (tally - quota * self.scale) * self.scale // tally
+            self.transfer_values[pile] = self.transfer_values[pile] * fraction // self.scale
+            self.set_weights(pile, self.multiplicities[pile] * self.transfer_values[pile])
@@ -59,6 +59,18 @@ class TieBreaker(object):
             column += 1
         return list(tied_candidates)[0]
 
+    # Return the tied candidates in the order that repeatedly breaking the
+    # tie, and setting aside the winner, would pick them
+    def order_ties(self, tied_candidates, reverse=False):
+        self.ties_broken = True
+        random_ordering = copy(self.random_ordering)
+        if reverse:
+            random_ordering.reverse()
+        position = dict((candidate, i) for i, candidate in enumerate(random_ordering))
+        if getattr(list(tied_candidates)[0], '__iter__', False):
+            return sorted(tied_candidates, key=lambda candidate: [position[c] for c in candidate])
+        return sorted(tied_candidates, key=lambda candidate: position[candidate])
+
     #
     def as_list(self):
         return self.random_ordering
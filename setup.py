@@ -9,6 +9,7 @@ LICENSE = open(os.path.join(here, 'LICENSE.txt')).read()
 
 requires = [
     'python-graph-core >= 1.8.0',
+    'numpy',
     ]
 
 setup(name='python-vote-core',
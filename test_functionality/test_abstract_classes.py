@@ -0,0 +1,75 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pyvotecore.irv import IRV
+from pyvotecore.plurality import Plurality
+from pyvotecore.range import Range
+from pyvotecore.ranked_pairs import RankedPairs
+from pyvotecore.schulze_method import SchulzeMethod
+from pyvotecore.schulze_npr import SchulzeNPR
+from pyvotecore.schulze_pr import SchulzePR
+from pyvotecore.schulze_stv import SchulzeSTV
+from pyvotecore.stv import STV
+import copy
+import unittest
+
+
+class TestVotingSystem(unittest.TestCase):
+
+    def assertBallotsUnchanged(self, system, input, **kwargs):
+        original = copy.deepcopy(input)
+        for aggregate in (True, False):
+            system(input, aggregate=aggregate, **kwargs)
+            self.assertEqual(input, original)
+
+    def test_ballots_unchanged(self):
+
+        # Generate data
+        grouping = [
+            {"count":3, "ballot":[["A"], ["B", "C"]]},
+            {"ballot":[["C"], ["A"]]},
+            {"count":2, "ballot":[["B"], ["C"], ["A"]]},
+        ]
+        ranking = [
+            {"count":3, "ballot":{"A":1, "B":2}},
+            {"ballot":{"C":1, "A":2}},
+            {"count":2, "ballot":{"B":1, "C":2, "A":3}},
+        ]
+        ordering = [
+            {"count":3, "ballot":["A", "B"]},
+            {"ballot":["C", "A"]},
+            {"count":2, "ballot":["B", "C", "A"]},
+        ]
+        single = [
+            {"count":3, "ballot":"A"},
+            {"ballot":"C"},
+        ]
+        rating = [
+            {"count":3, "ballot":{"A":10, "B":4}},
+            {"ballot":{"C":7}},
+        ]
+
+        # Run tests
+        for system in (SchulzeMethod, RankedPairs, SchulzeNPR, SchulzePR):
+            self.assertBallotsUnchanged(system, grouping, ballot_notation="grouping")
+            self.assertBallotsUnchanged(system, ranking, ballot_notation="ranking")
+        self.assertBallotsUnchanged(SchulzeSTV, grouping, ballot_notation="grouping", required_winners=2)
+        self.assertBallotsUnchanged(STV, ordering, required_winners=2)
+        self.assertBallotsUnchanged(IRV, ordering)
+        self.assertBallotsUnchanged(Plurality, single)
+        self.assertBallotsUnchanged(Range, rating)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,124 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pyvotecore.aggregation import aggregate_ballots
+from pyvotecore.ballot_store import BallotStore
+from pyvotecore.schulze_method import SchulzeMethod
+from pyvotecore.stv import STV
+import unittest
+
+
+class TestAggregation(unittest.TestCase):
+
+    def test_grouping(self):
+
+        # Generate data
+        input = [
+            {"count":2, "ballot":[["A"], ["B", "C"]]},
+            {"ballot":[["A"], [], ["C", "B"]]},
+            {"count":3, "ballot":[["B"], ["A"]]},
+        ]
+        output = aggregate_ballots(input, ballot_notation="grouping")
+
+        # Run tests
+        self.assertEqual(output, [
+            {"count":3, "ballot":[["A"], ["B", "C"]]},
+            {"count":3, "ballot":[["B"], ["A"]]},
+        ])
+
+    def test_ranking(self):
+
+        # Generate data
+        input = [
+            {"count":1, "ballot":{"A":1, "B":2, "C":2}},
+            {"count":1, "ballot":{"A":3, "B":7, "C":7}},
+            {"count":1, "ballot":{"A":2, "B":1, "C":3}},
+        ]
+        output = aggregate_ballots(input, ballot_notation="ranking")
+
+        # Run tests
+        self.assertEqual(output, [
+            {"count":2, "ballot":{"A":1, "B":2, "C":2}},
+            {"count":1, "ballot":{"A":2, "B":1, "C":3}},
+        ])
+
+    def test_rating(self):
+
+        # Generate data
+        input = [
+            {"count":1, "ballot":{"A":10, "B":5}},
+            {"count":1, "ballot":{"A":8, "B":4}},
+            {"count":1, "ballot":{"B":5, "A":10}},
+        ]
+        output = aggregate_ballots(input, ballot_notation="rating")
+
+        # Run tests
+        self.assertEqual(output, [
+            {"count":2, "ballot":{"A":10, "B":5}},
+            {"count":1, "ballot":{"A":8, "B":4}},
+        ])
+
+    def test_ballot_store(self):
+
+        # Generate data
+        input = [
+            {"count":1, "ballot":["c1", "c2"]},
+            {"count":2, "ballot":["c2"]},
+            {"count":4, "ballot":["c1", "c2"]},
+        ]
+        output = aggregate_ballots(BallotStore.from_ballots(input))
+
+        # Run tests
+        self.assertEqual(list(output.orderings()), [
+            {"count":5, "ballot":["c1", "c2"]},
+            {"count":2, "ballot":["c2"]},
+        ])
+
+    def test_voting_systems(self):
+
+        # Generate data
+        input = [
+            {"count":1, "ballot":["c1", "c2", "c3"]},
+        ] * 56 + [
+            {"count":1, "ballot":["c2", "c3", "c1"]},
+        ] * 40 + [
+            {"count":1, "ballot":["c3", "c1", "c2"]},
+        ] * 20
+        system = STV(input, required_winners=2)
+
+        # Run tests
+        self.assertEqual(len(system.ballots), 3)
+        self.assertEqual(system.as_dict()["rounds"], [{
+            'tallies': {'c3': 20.0, 'c2': 40.0, 'c1': 56.0},
+            'winners': set(['c2', 'c1'])
+        }])
+        self.assertEqual(len(STV(input, required_winners=2, aggregate=False).ballots), 116)
+
+    def test_condorcet_systems(self):
+
+        # Generate data
+        input = [
+            {"count":1, "ballot":[["A"], ["B", "C"]]},
+            {"count":1, "ballot":[["A"], ["C", "B"]]},
+            {"count":1, "ballot":[["B"], ["A"], ["C"]]},
+        ]
+        system = SchulzeMethod(input, ballot_notation="grouping")
+
+        # Run tests
+        self.assertEqual(len(system.ballots), 2)
+        self.assertEqual(system.winner, "A")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,131 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pyvotecore.ballot_store import BallotStore
+from pyvotecore.schulze_method import SchulzeMethod
+from pyvotecore.schulze_npr import SchulzeNPR
+from pyvotecore.plurality_at_large import PluralityAtLarge
+from pyvotecore.stv import STV
+import unittest
+
+
+class TestBallotStore(unittest.TestCase):
+
+    def test_grouping_notation(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["A"], ["B", "C"]]},
+            {"ballot":[["C"], ["A"]]},
+        ]
+        store = BallotStore.from_ballots(input, ballot_notation="grouping")
+
+        # Run tests
+        self.assertEqual(store.candidates, ['B', 'C', 'A'])
+        self.assertEqual(store.weights.tolist(), [3, 1])
+        self.assertEqual(list(store), [
+            {"count":3, "ballot":{"A":2.0, "B":1.0, "C":1.0}},
+            {"count":1, "ballot":{"A":1.0, "C":2.0}},
+        ])
+
+    def test_orderings(self):
+
+        # Generate data
+        input = [
+            {"count":4, "ballot":["orange"]},
+            {"count":2, "ballot":["pear", "orange"]},
+            {"count":8, "ballot":["chocolate", "strawberry", "pear"]},
+        ]
+        store = BallotStore.from_ballots(input)
+
+        # Run tests
+        self.assertEqual(list(store.orderings()), input)
+
+    def test_schulze_method(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["A"], ["C"], ["D"], ["B"]]},
+            {"count":9, "ballot":[["B"], ["A"], ["C"], ["D"]]},
+            {"count":8, "ballot":[["C"], ["D"], ["A"], ["B"]]},
+            {"count":5, "ballot":[["D"], ["A"], ["B"], ["C"]]},
+            {"count":5, "ballot":[["D"], ["B"], ["C"], ["A"]]}
+        ]
+        store = BallotStore.from_ballots(input, ballot_notation="grouping")
+        output = SchulzeMethod(store).as_dict()
+
+        # Run tests
+        self.assertEqual(output, SchulzeMethod(input, ballot_notation="grouping").as_dict())
+        self.assertEqual(output["winner"], "C")
+
+    def test_schulze_npr(self):
+
+        # Generate data
+        input = [
+            {"count":2, "ballot":{"A":1, "B":2, "C":3, "D":4, "E":5}},
+            {"count":1, "ballot":{"A":5, "B":4, "C":3, "D":2, "E":1}},
+        ]
+        output = SchulzeNPR(BallotStore.from_ballots(input, ballot_notation="ranking"), winner_threshold=5).as_dict()
+
+        # Run tests
+        self.assertEqual(output["order"], ['A', 'B', 'C', 'D', 'E'])
+
+    def test_stv(self):
+
+        # Generate data
+        input = [
+            {"count":4, "ballot":["orange"]},
+            {"count":2, "ballot":["pear", "orange"]},
+            {"count":8, "ballot":["chocolate", "strawberry"]},
+            {"count":4, "ballot":["chocolate", "sweets"]},
+            {"count":1, "ballot":["strawberry"]},
+            {"count":1, "ballot":["sweets"]}
+        ]
+        output = STV(BallotStore.from_ballots(input), required_winners=3).as_dict()
+
+        # Run tests
+        self.assertEqual(output["winners"], set(['orange', 'strawberry', 'chocolate']))
+        self.assertEqual(output["quota"], 6)
+
+    def test_plurality_at_large(self):
+
+        # Generate data
+        input = [
+            {"count":26, "ballot":["c1", "c2"]},
+            {"count":22, "ballot":["c1", "c3"]},
+            {"count":23, "ballot":["c2", "c3"]}
+        ]
+        output = PluralityAtLarge(BallotStore.from_ballots(input), required_winners=2).as_dict()
+
+        # Run tests
+        self.assertEqual(output, {
+            'candidates': set(['c1', 'c2', 'c3']),
+            'tallies': {'c3': 45, 'c2': 49, 'c1': 48},
+            'winners': set(['c2', 'c1'])
+        })
+
+    def test_plurality_at_large_too_many_candidates(self):
+
+        # Generate data
+        input = [
+            {"count":1, "ballot":["c1", "c2", "c3"]},
+        ]
+        store = BallotStore.from_ballots(input)
+
+        # Run tests
+        self.assertRaises(Exception, PluralityAtLarge, store, required_winners=2)
+
+if __name__ == "__main__":
+    unittest.main()
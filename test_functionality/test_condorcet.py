@@ -13,7 +13,12 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
+from pyvotecore.condorcet import CondorcetHelper
 from pyvotecore.schulze_method import SchulzeMethod
+from pyvotecore.pairwise import UNRANKED, pairwise_matrix, rank_matrix, count_vector
+from pygraph.classes.digraph import digraph
+import itertools
+import random
 import unittest
 
 
@@ -112,5 +117,90 @@ class TestCondorcet(unittest.TestCase):
             "winner": 'Andrea'
         })
 
+    def test_truncated_ballots(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":{"A":1, "B":2}},
+            {"count":2, "ballot":{"C":1}},
+            {"count":1, "ballot":{"D":1, "A":2}},
+        ]
+        system = SchulzeMethod(input, ballot_notation="ranking")
+        output = system.as_dict()
+
+        # Run tests
+        self.assertEqual([len(ballot["ballot"]) for ballot in system.ballots], [2, 1, 2])
+        self.assertEqual(output["pairs"], {
+            ('A', 'B'): 4, ('A', 'C'): 4, ('A', 'D'): 3,
+            ('B', 'A'): 0, ('B', 'C'): 3, ('B', 'D'): 3,
+            ('C', 'A'): 2, ('C', 'B'): 2, ('C', 'D'): 2,
+            ('D', 'A'): 1, ('D', 'B'): 1, ('D', 'C'): 1,
+        })
+        self.assertEqual(output["winner"], "A")
+
+    def test_schwartz_and_smith_sets(self):
+
+        # Generate data: A, B and C defeat each other in a cycle, A and D tie,
+        # and D defeats B and C while every other candidate defeats E
+        graph = digraph()
+        graph.add_nodes(["A", "B", "C", "D", "E"])
+        for edge in [("A", "B"), ("B", "C"), ("C", "A"), ("D", "B"), ("D", "C"), ("A", "E"), ("B", "E"), ("C", "E"), ("D", "E")]:
+            graph.add_edge(edge)
+
+        # Run tests
+        self.assertEqual(
+            sorted(sorted(component) for component in CondorcetHelper.strongly_connected_components(graph)),
+            [["A", "B", "C"], ["D"], ["E"]]
+        )
+        self.assertEqual(CondorcetHelper.schwartz_set(graph), set(["D"]))
+        self.assertEqual(CondorcetHelper.smith_set(graph), set(["A", "B", "C", "D"]))
+
+        # Once A defeats D, the cycle takes in D as well
+        graph.add_edge(("A", "D"))
+        self.assertEqual(CondorcetHelper.schwartz_set(graph), set(["A", "B", "C", "D"]))
+        self.assertEqual(CondorcetHelper.smith_set(graph), set(["A", "B", "C", "D"]))
+
+    # The pairwise tallies match those of padding each ballot and summing the
+    # counts ballot by ballot, as ballots_into_graph used to
+    def test_pairwise_matrix(self):
+
+        # Generate data
+        generator = random.Random(1)
+        candidates = ["A", "B", "C", "D", "E"]
+        ballots = [
+            {"ballot": dict(
+                (candidate, float(generator.randint(1, 3)))
+                for candidate in generator.sample(candidates, generator.randint(1, 5))
+            )}
+            for i in range(40)
+        ]
+        integer_ballots = [dict(ballot, count=generator.randint(1, 9)) for ballot in ballots]
+        fractional_ballots = [dict(ballot, count=generator.choice([0.1, 0.2, 0.3, 1.7, 2])) for ballot in ballots]
+
+        def dict_loop_wins(ballots):
+            padded = []
+            for ballot in ballots:
+                lowest_preference = min(ballot["ballot"].values()) - 1
+                padded.append(dict((candidate, ballot["ballot"].get(candidate, lowest_preference)) for candidate in candidates))
+            wins = dict(((candidate, candidate), 0) for candidate in candidates)
+            for pair in itertools.permutations(candidates, 2):
+                wins[pair] = sum([
+                    ballot["count"]
+                    for ballot, ratings in zip(ballots, padded)
+                    if ratings[pair[0]] > ratings[pair[1]]
+                ])
+            return [[wins[(i, j)] for j in candidates] for i in candidates]
+
+        # Run tests
+        for input in [integer_ballots, fractional_ballots]:
+            self.assertEqual(pairwise_matrix(rank_matrix(candidates, input), count_vector(input)).tolist(), dict_loop_wins(input))
+        self.assertEqual(pairwise_matrix(rank_matrix(candidates, integer_ballots), count_vector(integer_ballots)).dtype.kind, "i")
+
+        # Adding tallies to earlier ones continues the same sums
+        wins = pairwise_matrix(rank_matrix(candidates, fractional_ballots[:15]), count_vector(fractional_ballots[:15]))
+        wins = pairwise_matrix(rank_matrix(candidates, fractional_ballots[15:]), count_vector(fractional_ballots[15:]), wins)
+        self.assertEqual(wins.tolist(), dict_loop_wins(fractional_ballots))
+        self.assertEqual(rank_matrix(candidates, [{"ballot": {"B": 1.0}}]).tolist(), [[UNRANKED, 1.0, UNRANKED, UNRANKED, UNRANKED]])
+
 if __name__ == "__main__":
     unittest.main()
@@ -84,5 +84,56 @@ class TestInstantRunoff(unittest.TestCase):
             ]
         })
 
+    # IRV, pile engine
+    def test_irv_piles_engine(self):
+
+        # Generate data
+        input = [
+            {"count":26, "ballot":["c1", "c2", "c3"]},
+            {"count":20, "ballot":["c2", "c3", "c1"]},
+            {"count":23, "ballot":["c3", "c1", "c2"]}
+        ]
+        output = IRV(input, engine="piles").as_dict()
+
+        # Run tests
+        self.assertEqual(output, IRV(input).as_dict())
+        self.assertEqual(output["winner"], "c3")
+
+    # IRV, trie engine
+    def test_irv_trie_engine(self):
+
+        # Generate data
+        input = [
+            {"count":26, "ballot":["c1", "c2", "c3"]},
+            {"count":20, "ballot":["c2", "c3", "c1"]},
+            {"count":20, "ballot":["c3", "c1", "c2"]}
+        ]
+        output = IRV(input, tie_breaker=["c1", "c2", "c3"], engine="trie").as_dict()
+
+        # Run tests
+        self.assertEqual(output, IRV(input, tie_breaker=["c1", "c2", "c3"]).as_dict())
+        self.assertEqual(output["rounds"][0]["tied_losers"], set(['c2', 'c3']))
+
+    # IRV, bulk exclusion
+    def test_irv_bulk_exclusion(self):
+
+        # Generate data
+        input = [
+            {"count":15, "ballot":["c1", "c2"]},
+            {"count":14, "ballot":["c2", "c1"]},
+            {"count":4, "ballot":["c3", "c2"]},
+            {"count":2, "ballot":["c4", "c1"]},
+            {"count":1, "ballot":["c5", "c2"]}
+        ]
+        output = IRV(input, bulk_exclusion=True).as_dict()
+
+        # Run tests
+        self.assertEqual(output["rounds"], [
+            {'tallies': {'c1': 15.0, 'c2': 14.0, 'c3': 4.0, 'c4': 2.0, 'c5': 1.0}, 'losers': set(['c4', 'c5'])},
+            {'tallies': {'c1': 17.0, 'c2': 15.0, 'c3': 4.0}, 'loser': 'c3'},
+            {'tallies': {'c1': 17.0, 'c2': 19.0}, 'winner': 'c2'}
+        ])
+        self.assertEqual(output["winner"], IRV(input).as_dict()["winner"])
+
 if __name__ == "__main__":
     unittest.main()
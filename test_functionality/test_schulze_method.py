@@ -154,5 +154,29 @@ class TestSchulzeMethod(unittest.TestCase):
         })
         self.assertEqual(output['tied_winners'], set(['A', 'B']))
 
+    def test_widest_path_engine(self):
+
+        # Generate data
+        input = [
+            {"count":5, "ballot":[["A"], ["C"], ["B"], ["E"], ["D"]]},
+            {"count":5, "ballot":[["A"], ["D"], ["E"], ["C"], ["B"]]},
+            {"count":8, "ballot":[["B"], ["E"], ["D"], ["A"], ["C"]]},
+            {"count":3, "ballot":[["C"], ["A"], ["B"], ["E"], ["D"]]},
+            {"count":7, "ballot":[["C"], ["A"], ["E"], ["B"], ["D"]]},
+            {"count":2, "ballot":[["C"], ["B"], ["A"], ["D"], ["E"]]},
+            {"count":7, "ballot":[["D"], ["C"], ["E"], ["B"], ["A"]]},
+            {"count":8, "ballot":[["E"], ["B"], ["A"], ["D"], ["C"]]}
+        ]
+        output = SchulzeMethod(input, ballot_notation="grouping", engine="widest_path").as_dict()
+
+        # Run tests
+        self.assertEqual(output, SchulzeMethod(input, ballot_notation="grouping").as_dict())
+        self.assertEqual(output['actions'], [
+            {'edges': set([('E', 'A')])},
+            {'edges': set([('C', 'E')])},
+            {'nodes': set(['A', 'C', 'B', 'D'])}
+        ])
+        self.assertRaises(Exception, SchulzeMethod, input, ballot_notation="grouping", engine="unknown")
+
 if __name__ == "__main__":
     unittest.main()
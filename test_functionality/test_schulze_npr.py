@@ -62,6 +62,28 @@ class TestSchulzeNPR(unittest.TestCase):
             ]
         })
 
+    def test_widest_path_engine(self):
+
+        # Generate data
+        input = [
+            {"count":5, "ballot":[["A"], ["C"], ["B"], ["E"], ["D"]]},
+            {"count":5, "ballot":[["A"], ["D"], ["E"], ["C"], ["B"]]},
+            {"count":8, "ballot":[["B"], ["E"], ["D"], ["A"], ["C"]]},
+            {"count":3, "ballot":[["C"], ["A"], ["B"], ["E"], ["D"]]},
+            {"count":7, "ballot":[["C"], ["A"], ["E"], ["B"], ["D"]]},
+            {"count":2, "ballot":[["C"], ["B"], ["A"], ["D"], ["E"]]},
+            {"count":7, "ballot":[["D"], ["C"], ["E"], ["B"], ["A"]]},
+            {"count":8, "ballot":[["E"], ["B"], ["A"], ["D"], ["C"]]},
+            {"count":4, "ballot":[["B"], ["A"], ["C"], ["D"], ["E"]]},
+            {"count":4, "ballot":[["D"], ["E"], ["A"], ["B"], ["C"]]},
+        ]
+        output = SchulzeNPR(input, ballot_notation="grouping", tie_breaker=["A", "B", "C", "D", "E"], engine="widest_path").as_dict()
+
+        # Run tests
+        self.assertEqual(output, SchulzeNPR(input, ballot_notation="grouping", tie_breaker=["A", "B", "C", "D", "E"]).as_dict())
+        self.assertEqual(output["order"], ['E', 'A', 'B', 'D', 'C'])
+        self.assertEqual(output["rounds"][1], {'winner': 'A', 'tied_winners': set(['A', 'B'])})
+
 
 if __name__ == "__main__":
     unittest.main()
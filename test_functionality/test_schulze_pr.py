@@ -88,5 +88,67 @@ class TestSchulzePR(unittest.TestCase):
             ],
         })
 
+    # Each round k completes every pair of the candidates not yet elected
+    def test_estimate_cost(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"], ["d"], ["e"]]},
+            {"count":2, "ballot":[["c"], ["d", "e"], ["a"]]},
+        ]
+        estimate = SchulzePR.estimate_cost(input, ballot_notation="grouping")
+        output = SchulzePR(input, ballot_notation="grouping", vote_management="iterative", max_cost=estimate["cost"])
+
+        # Run tests
+        self.assertEqual(estimate["completions"], 20 + 12 + 6 + 2)
+        self.assertEqual(estimate["completions"], output.as_dict()["vote_management"]["strengths"])
+        self.assertEqual(estimate["cost"], 20 * 3 + 12 * 6 + 6 * 10 + 2 * 18)
+        self.assertEqual(SchulzePR.estimate_cost(input, winner_threshold=1, ballot_notation="grouping")["completions"], 20)
+        self.assertRaises(Exception, SchulzePR, input, ballot_notation="grouping", max_cost=estimate["cost"] - 1)
+
+    # Progress is reported for every pair in every round
+    def test_progress(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"]]},
+            {"count":2, "ballot":[["c"], ["b"], ["a"]]},
+        ]
+        steps = []
+        SchulzePR(input, ballot_notation="grouping", progress=lambda *step: steps.append(step))
+
+        # Run tests
+        self.assertEqual(steps, [("rounds", 0, 2)] + [("pairs", i, 6) for i in range(1, 7)] + [("rounds", 1, 2)] + [("pairs", i, 2) for i in range(1, 3)])
+
+    # Grouping ballots by the elected candidates completes every pair just as
+    # proportional completion does from the ballots themselves
+    def test_elected_groups(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":{"a":1, "b":2, "c":2, "d":3}},
+            {"count":2.5, "ballot":{"c":1, "e":2}},
+            {"count":1, "ballot":{"d":1, "a":1, "b":2, "e":3}},
+            {"count":4, "ballot":{"e":1, "b":2}},
+        ]
+        system = SchulzePR(input, ballot_notation="ranking")
+        system.start_elected_groups(system.candidates)
+        system.order = []
+        for winner in ["b", "d"]:
+            system.order.append(winner)
+            system.split_elected_groups(winner)
+        system.required_winners = 3
+        system.generate_completed_patterns()
+
+        # Run tests
+        for candidate_from in ["a", "c", "e"]:
+            others = sorted(set(["a", "c", "e"]) - set([candidate_from]))
+            tallies = system.elected_group_tallies(candidate_from, others)
+            for index, candidate_to in enumerate(others):
+                self.assertEqual(
+                    system.elected_group_completion(candidate_from, candidate_to, [tally[:, index] for tally in tallies]),
+                    system.proportional_completion(candidate_from, set([candidate_to]) | set(system.order))
+                )
+
 if __name__ == "__main__":
     unittest.main()
@@ -14,6 +14,15 @@
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from pyvotecore.schulze_stv import SchulzeSTV
+from pyvotecore.candidate_set_graph import CandidateSetGraph
+from pyvotecore.schulze_helper import PREFERRED_LESS, PREFERRED_MORE, PATTERN_TABLES_LIMIT, pattern_tables, pattern_table_cache
+import copy
+import os
+import pickle
+import shutil
+import tempfile
+import threading
+import time
 import unittest
 
 
@@ -179,5 +188,295 @@ class TestSchulzeSTV(unittest.TestCase):
         self.assert_(set(["B1", "B2"]) & output["winners"])
         self.assert_(set(["C1", "C2"]) & output["winners"])
 
+    # Voters indifferent between a and b have their weight shared out in
+    # proportion to the voters who did choose between them
+    def test_proportional_completion(self):
+
+        # Generate data
+        input = [
+            {"count":2, "ballot":{"a":2, "b":2, "c":1}},
+            {"count":1, "ballot":{"a":3, "b":1, "c":2}},
+            {"count":3, "ballot":{"a":1, "b":2, "c":3}},
+        ]
+        system = SchulzeSTV(input, required_winners=2, ballot_notation="rating")
+
+        # Run tests
+        self.assertEqual(system.proportional_completion("a", ["b", "c"]), {
+            (PREFERRED_LESS, PREFERRED_LESS): 3.0,
+            (PREFERRED_LESS, PREFERRED_MORE): 1.5,
+            (PREFERRED_MORE, PREFERRED_LESS): 0.0,
+            (PREFERRED_MORE, PREFERRED_MORE): 1.5,
+        })
+
+    # Ballots ordering the candidates alike share a relation
+    def test_completion_relations(self):
+
+        # Generate data
+        input = [
+            {"count":2, "ballot":{"a":3, "b":2, "c":1}},
+            {"count":3, "ballot":{"a":2, "b":2, "c":1}},
+            {"count":1, "ballot":{"a":9, "b":5, "c":1}},
+        ]
+        system = SchulzeSTV(input, required_winners=2, ballot_notation="rating")
+        ballot_ids, relations, counts = system.completion_relations()
+
+        # Run tests
+        self.assertEqual(counts.tolist(), [3, 3])
+        self.assertEqual(relations[ballot_ids["a"]][:, [ballot_ids["b"], ballot_ids["c"]]].tolist(), [[2, 2], [1, 2]])
+        self.assertEqual(relations[ballot_ids["c"]][:, [ballot_ids["a"], ballot_ids["b"]]].tolist(), [[0, 0], [0, 0]])
+
+    # Voters who prefer only the first winner can't be spread over the
+    # others, which caps the strength below an even third of the votes
+    def test_strength_of_vote_management(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"], ["d"]]},
+            {"count":2, "ballot":[["c"], ["d"], ["a"], ["b"]]},
+        ]
+        system = SchulzeSTV(input, required_winners=3, ballot_notation="grouping")
+        profile = {
+            (PREFERRED_LESS, PREFERRED_LESS, PREFERRED_LESS): 1.0,
+            (PREFERRED_LESS, PREFERRED_LESS, PREFERRED_MORE): 3.0,
+            (PREFERRED_LESS, PREFERRED_MORE, PREFERRED_LESS): 2.0,
+            (PREFERRED_MORE, PREFERRED_LESS, PREFERRED_LESS): 0.5,
+            (PREFERRED_LESS, PREFERRED_MORE, PREFERRED_MORE): 10.0,
+            (PREFERRED_MORE, PREFERRED_LESS, PREFERRED_MORE): 1.0,
+            (PREFERRED_MORE, PREFERRED_MORE, PREFERRED_LESS): 2.0,
+            (PREFERRED_MORE, PREFERRED_MORE, PREFERRED_MORE): 5.0,
+        }
+
+        # Run tests
+        self.assertEqual(system.strength_of_vote_management(profile), 4.75)
+        profile[(PREFERRED_LESS, PREFERRED_MORE, PREFERRED_MORE)] = 4.0
+        self.assertEqual(system.strength_of_vote_management(profile), 4.5)
+
+    # Pattern tables are built once for each number of winners
+    def test_pattern_tables(self):
+
+        # Generate data
+        tables = pattern_tables(2)
+        for required_winners in range(1, PATTERN_TABLES_LIMIT + 3):
+            pattern_tables(required_winners)
+
+        # Run tests
+        self.assertEqual(tables.patterns, [
+            (PREFERRED_LESS, PREFERRED_LESS),
+            (PREFERRED_LESS, PREFERRED_MORE),
+            (PREFERRED_MORE, PREFERRED_LESS),
+            (PREFERRED_MORE, PREFERRED_MORE),
+        ])
+        self.assertEqual(tables.numbers.tolist(), [0, 6, 2, 8])
+        self.assertEqual(tables.masks.tolist(), [3, 1, 2, 0])
+        self.assertEqual(tables.cut_sizes.tolist(), [0, 1, 1, 2])
+        self.assertEqual(len(pattern_table_cache), PATTERN_TABLES_LIMIT)
+        self.assertFalse(2 in pattern_table_cache)
+        self.assertTrue(pattern_tables(4) is pattern_tables(4))
+
+    # The closed form reaches the same limit without iterating
+    def test_closed_form_vote_management(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"], ["d"]]},
+            {"count":2, "ballot":[["c"], ["d"], ["a"], ["b"]]},
+        ]
+        iterative = SchulzeSTV(input, required_winners=3, ballot_notation="grouping", vote_management="iterative")
+        closed_form = SchulzeSTV(input, required_winners=3, ballot_notation="grouping", vote_management="closed_form")
+        profile = {
+            (PREFERRED_LESS, PREFERRED_LESS, PREFERRED_LESS): 1.0,
+            (PREFERRED_LESS, PREFERRED_LESS, PREFERRED_MORE): 3.0,
+            (PREFERRED_LESS, PREFERRED_MORE, PREFERRED_LESS): 2.0,
+            (PREFERRED_MORE, PREFERRED_LESS, PREFERRED_LESS): 0.5,
+            (PREFERRED_LESS, PREFERRED_MORE, PREFERRED_MORE): 10.0,
+            (PREFERRED_MORE, PREFERRED_LESS, PREFERRED_MORE): 1.0,
+            (PREFERRED_MORE, PREFERRED_MORE, PREFERRED_LESS): 2.0,
+            (PREFERRED_MORE, PREFERRED_MORE, PREFERRED_MORE): 5.0,
+        }
+
+        # Run tests
+        self.assertEqual(closed_form.winners, iterative.winners)
+        self.assertEqual(closed_form.as_dict()["vote_management"], {
+            "strengths": 4,
+            "iterations": 0,
+            "saved_iterations": iterative.as_dict()["vote_management"]["iterations"],
+        })
+        self.assertEqual(closed_form.strength_of_vote_management(profile), 4.75)
+        self.assertEqual(iterative.strength_of_vote_management(profile), 4.75)
+        self.assertTrue(iterative.as_dict()["vote_management"]["iterations"] > 4)
+        self.assertEqual(iterative.as_dict()["vote_management"]["saved_iterations"], 0)
+        self.assertFalse("vote_management" in SchulzeSTV(input, required_winners=3, ballot_notation="grouping").as_dict())
+        self.assertRaises(Exception, SchulzeSTV, input, required_winners=3, ballot_notation="grouping", vote_management="unknown")
+
+    # Candidate sets are numbered in colex order
+    def test_candidate_set_graph(self):
+
+        # Generate data: ab, ac and bc defeat each other in a cycle and all
+        # defeat bd, while ad, cd and bd have no edges between them
+        graph = CandidateSetGraph(["d", "c", "b", "a"], 2)
+        ab, ac, bc, ad, bd, cd = [graph.rank(candidate_set) for candidate_set in ["ab", "ac", "bc", "ad", "bd", "cd"]]
+        graph.add_edges([(ab, ac, 3), (ac, bc, 2), (bc, ab, 3), (ab, bd, 1), (ac, bd, 1), (bc, bd, 1)])
+
+        # Run tests
+        self.assertEqual([ab, ac, bc, ad, bd, cd], range(6))
+        self.assertEqual([graph.candidate_set(node) for node in range(6)], [
+            ("a", "b"), ("a", "c"), ("b", "c"), ("a", "d"), ("b", "d"), ("c", "d")
+        ])
+        self.assertEqual(graph.unbeaten_sets(), set([("a", "d"), ("c", "d")]))
+        self.assertEqual(graph.schwartz_set_heuristic(), [
+            {'nodes': set([("b", "d")])},
+            {'edges': set([(("a", "c"), ("b", "c"))])},
+            {'nodes': set([("a", "b"), ("a", "c")])},
+        ])
+        self.assertEqual(graph.unbeaten_sets(), set([("b", "c"), ("a", "d"), ("c", "d")]))
+
+    # Oversized elections are turned away before any work is done
+    def test_estimate_cost(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"], ["d"], ["e"]]},
+            {"count":2, "ballot":[["c"], ["d", "e"], ["a"]]},
+        ]
+        estimate = SchulzeSTV.estimate_cost(input, required_winners=2, ballot_notation="grouping")
+        output = SchulzeSTV(input, required_winners=2, ballot_notation="grouping", vote_management="iterative", max_cost=estimate["cost"])
+
+        # Run tests
+        self.assertEqual(estimate["completions"], 30)
+        self.assertEqual(estimate["completions"], output.as_dict()["vote_management"]["strengths"])
+        self.assertTrue(estimate["min_flow_runs"] <= output.as_dict()["vote_management"]["iterations"])
+        self.assertEqual(estimate["patterns"], 6)
+        self.assertEqual(estimate["cost"], 180)
+        self.assertEqual(estimate["edges"], 60)
+        self.assertRaises(Exception, SchulzeSTV, input, required_winners=2, ballot_notation="grouping", max_cost=179)
+
+    # A count reports its progress and can be stopped part way through
+    def test_progress_and_cancellation(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"], ["d"], ["e"]]},
+            {"count":2, "ballot":[["c"], ["d", "e"], ["a"]]},
+        ]
+        original = copy.deepcopy(input)
+        steps = []
+        SchulzeSTV(input, required_winners=2, ballot_notation="grouping", progress=lambda *step: steps.append(step))
+        cancel = threading.Event()
+
+        def cancel_after_three(phase, done, total):
+            if done == 3:
+                cancel.set()
+
+        # Run tests
+        self.assertEqual(steps[0], ("candidate_sets", 0, 10))
+        self.assertEqual(steps[10], ("candidate_sets", 10, 10))
+        self.assertRaises(Exception, SchulzeSTV, input, required_winners=2, ballot_notation="grouping", progress=cancel_after_three, cancel=cancel)
+        self.assertRaises(Exception, SchulzeSTV, input, required_winners=2, ballot_notation="grouping", deadline=time.time() - 1)
+        self.assertEqual(input, original)
+
+    # A count stopped part way resumes from its checkpoint to the same result
+    def test_checkpoint_and_resume(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"], ["d"], ["e"]]},
+            {"count":2, "ballot":[["c"], ["d", "e"], ["a"]]},
+            {"count":4, "ballot":[["e"], ["b"], ["a", "c"]]},
+        ]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "count.checkpoint")
+        uninterrupted = SchulzeSTV(input, required_winners=2, ballot_notation="grouping", vote_management="closed_form")
+        cancel = threading.Event()
+
+        def cancel_after_four(phase, done, total):
+            if done == 4:
+                cancel.set()
+        self.assertRaises(Exception, SchulzeSTV, input, required_winners=2, ballot_notation="grouping", vote_management="closed_form", checkpoint=path, resume_from=path, progress=cancel_after_four, cancel=cancel)
+        steps = []
+        resumed = SchulzeSTV(input, required_winners=2, ballot_notation="grouping", vote_management="closed_form", checkpoint=path, resume_from=path, progress=lambda *step: steps.append(step))
+
+        # Run tests
+        self.assertEqual(steps[0], ("candidate_sets", 4, 10))
+        self.assertEqual(resumed.as_dict(), uninterrupted.as_dict())
+        for resumed_edges, uninterrupted_edges in zip(resumed.graph.edges(), uninterrupted.graph.edges()):
+            self.assertEqual(resumed_edges.tolist(), uninterrupted_edges.tolist())
+        self.assertRaises(Exception, SchulzeSTV, input[:2], required_winners=2, ballot_notation="grouping", resume_from=path)
+
+    # A count stopped while adding a candidate set's edges only saves the
+    # candidate sets it finished
+    def test_checkpoint_within_candidate_set(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"], ["d"], ["e"]]},
+            {"count":2, "ballot":[["c"], ["d", "e"], ["a"]]},
+            {"count":4, "ballot":[["e"], ["b"], ["a", "c"]]},
+        ]
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        path = os.path.join(directory, "count.checkpoint")
+        uninterrupted = SchulzeSTV(input, required_winners=2, ballot_notation="grouping")
+        add_edges = CandidateSetGraph.add_edges
+        calls = []
+
+        def interrupted_add_edges(graph, edges):
+            calls.append(edges)
+            if len(calls) == 4:
+                add_edges(graph, edges[:1])
+                raise KeyboardInterrupt
+            add_edges(graph, edges)
+        CandidateSetGraph.add_edges = interrupted_add_edges
+        try:
+            self.assertRaises(KeyboardInterrupt, SchulzeSTV, input, required_winners=2, ballot_notation="grouping", checkpoint=path)
+        finally:
+            CandidateSetGraph.add_edges = add_edges
+        resumed = SchulzeSTV(input, required_winners=2, ballot_notation="grouping", vote_management="iterative", resume_from=path)
+
+        # Run tests
+        self.assertTrue(len(calls[3]) > 1)
+        self.assertRaises(Exception, SchulzeSTV, input, required_winners=2, ballot_notation="grouping", vote_management="closed_form", resume_from=path)
+        output = resumed.as_dict()
+        self.assertEqual(output.pop("vote_management")["strengths"], 33)
+        self.assertEqual(output, uninterrupted.as_dict())
+        for resumed_edges, uninterrupted_edges in zip(resumed.graph.edges(), uninterrupted.graph.edges()):
+            self.assertEqual(resumed_edges.tolist(), uninterrupted_edges.tolist())
+
+    # Workers get a copy of the election that pickles without the caller's
+    # progress callback and cancel event
+    def test_worker_election(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["a"], ["b"], ["c"], ["d"]]},
+            {"count":2, "ballot":[["c"], ["d", "b"], ["a"]]},
+        ]
+        cancel = threading.Event()
+        system = SchulzeSTV(input, required_winners=2, ballot_notation="grouping", progress=lambda *step: None, cancel=cancel, deadline=time.time() + 600)
+        election = pickle.loads(pickle.dumps(system.worker_election()))
+        election.reset_vote_management_diagnostics()
+
+        # Run tests
+        self.assertEqual((election.progress, election.cancel, election.deadline), (None, None, None))
+        self.assertTrue(system.cancel is cancel)
+        self.assertEqual(election.candidate_set_edges(("a", "b", "c")), system.candidate_set_edges(("a", "b", "c")))
+
+    # Sharing candidate sets out over worker processes gives the same graph
+    def test_workers(self):
+
+        # Generate data
+        input = [
+            {"count":5, "ballot":[["A1", "A2"], ["B1", "B2"], ["C1", "C2"]]},
+            {"count":2, "ballot":[["B1", "B2"], ["A1", "A2", "C1", "C2"]]},
+            {"count":4, "ballot":[["C1", "C2"], ["B1", "B2"], ["A1", "A2"]]},
+        ]
+        serial = SchulzeSTV(input, required_winners=3, ballot_notation="grouping", tie_breaker=["A1", "A2", "B1", "B2", "C1", "C2"])
+        parallel = SchulzeSTV(input, required_winners=3, ballot_notation="grouping", tie_breaker=["A1", "A2", "B1", "B2", "C1", "C2"], workers=2)
+
+        # Run tests
+        self.assertEqual(parallel.as_dict(), serial.as_dict())
+        for parallel_edges, serial_edges in zip(parallel.graph.edges(), serial.graph.edges()):
+            self.assertEqual(parallel_edges.tolist(), serial_edges.tolist())
+
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,125 @@
+# Copyright (C) 2009, Brad Beattie
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+from pyvotecore.streaming import BallotReader, PairwiseAccumulator, RangeAccumulator, PluralityAccumulator, accumulate
+from pyvotecore.schulze_method import SchulzeMethod
+from pyvotecore.range import Range
+import json
+import os
+import shutil
+import tempfile
+import unittest
+
+
+class TestStreaming(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "w") as f:
+            f.write(content)
+        return path
+
+    def test_json_lines(self):
+
+        # Generate data
+        input = [
+            {"count":3, "ballot":[["A"], ["C"], ["D"], ["B"]]},
+            {"count":9, "ballot":[["B"], ["A"], ["C"], ["D"]]},
+            {"count":8, "ballot":[["C"], ["D"], ["A"], ["B"]]},
+            {"count":5, "ballot":[["D"], ["A"], ["B"], ["C"]]},
+            {"count":5, "ballot":[["D"], ["B"], ["C"], ["A"]]}
+        ]
+        path = self.write_file("ballots.jsonl", "\n".join(json.dumps(ballot) for ballot in input))
+        reader = BallotReader(path, chunk_size=2)
+        output = accumulate(PairwiseAccumulator("grouping"), reader).result().as_dict()
+
+        # Run tests
+        self.assertEqual(list(reader), input)
+        self.assertEqual(output["pairs"], SchulzeMethod(input, ballot_notation="grouping").as_dict()["pairs"])
+        self.assertEqual(output["winner"], "C")
+
+    def test_csv(self):
+
+        # Generate data
+        path = self.write_file("ballots.csv", "count,A,B,C\n3,1,2,\n,,1,2\n2,2,2,1\n")
+        accumulator = accumulate(PairwiseAccumulator("ranking"), BallotReader(path))
+
+        # Run tests
+        self.assertEqual(list(BallotReader(path)), [
+            {"count":3, "ballot":{"A":1, "B":2}},
+            {"count":1, "ballot":{"B":1, "C":2}},
+            {"count":2, "ballot":{"A":2, "B":2, "C":1}},
+        ])
+        self.assertEqual(accumulator.edges(), {
+            ('A', 'B'): 3,
+            ('A', 'C'): 3,
+            ('B', 'A'): 1,
+            ('B', 'C'): 4,
+            ('C', 'A'): 3,
+            ('C', 'B'): 2,
+        })
+
+    def test_candidates_in_later_chunks(self):
+
+        # Generate data
+        input = [
+            {"count":4, "ballot":{"A":1}},
+            {"count":2, "ballot":{"B":1, "C":2}},
+            {"count":1, "ballot":{"C":1, "A":2}},
+        ]
+        accumulator = accumulate(PairwiseAccumulator("ranking"), input, chunk_size=1)
+
+        # Run tests
+        self.assertEqual(accumulator.edges(), SchulzeMethod(input, ballot_notation="ranking").as_dict()["pairs"])
+
+    def test_range(self):
+
+        # Generate data
+        input = [
+            {"count":1, "ballot":{"Gary Johnson":86, "Fred Karger":78, "Jill Stein":77, "Barack Obama":64, "Ron Paul":56, "Mitt Romney":33}},
+            {"count":1, "ballot":{"Barack Obama":100, "Mitt Romney":0, "Gary Johnson":0}},
+            {"count":1, "ballot":{"Mitt Romney":100, "Barack Obama":0, "Gary Johnson":0}},
+            {"count":1, "ballot":{"Mitt Romney":0, "Barack Obama":0, "Ron Paul":100, "Gary Johnson":80}}
+        ]
+        output = accumulate(RangeAccumulator(), input, chunk_size=3).result(input).as_dict()
+
+        # Run tests
+        self.assertEqual(output, Range(input).as_dict())
+
+    def test_plurality_at_large(self):
+
+        # Generate data
+        input = [
+            {"count":26, "ballot":["c1", "c2"]},
+            {"count":22, "ballot":["c1", "c3"]},
+            {"count":23, "ballot":["c2", "c3"]}
+        ]
+        output = accumulate(PluralityAccumulator(required_winners=2), input, chunk_size=2).result().as_dict()
+
+        # Run tests
+        self.assertEqual(output, {
+            'candidates': set(['c1', 'c2', 'c3']),
+            'tallies': {'c3': 45, 'c2': 49, 'c1': 48},
+            'winners': set(['c2', 'c1'])
+        })
+
+if __name__ == "__main__":
+    unittest.main()
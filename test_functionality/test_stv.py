@@ -13,7 +13,11 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
-from pyvotecore.stv import STV
+from pyvotecore.stv import STV, BallotPiles
+from pyvotecore.ballot_trie import BallotTrie
+from decimal import Decimal
+import copy
+import threading
 import unittest
 
 
@@ -132,5 +136,181 @@ class TestSTV(unittest.TestCase):
             'winners': set(['c1', 'c2', 'c3'])
         })
 
+    # STV, a candidate wins after other ballots are exhausted
+    def test_stv_exhausted_ballots(self):
+
+        # Generate data
+        input = [
+            {"count":4, "ballot":["c1"]},
+            {"count":3, "ballot":["c2", "c1"]},
+            {"count":1, "ballot":["c3"]},
+            {"count":2, "ballot":["c4", "c2"]},
+            {"count":2.5, "ballot":["c5"]}
+        ]
+        output = STV(input, required_winners=2).as_dict()
+
+        # Run tests
+        self.assertEqual(output["rounds"][2], {'tallies': {'c1': 4.0, 'c2': 5.0, 'c5': 2.5}, 'winners': set(['c2'])})
+        self.assertEqual(output["winners"], set(['c1', 'c2']))
+        self.assertEqual(output, STV(input, required_winners=2, engine="piles").as_dict())
+
+    # The pile engines start over when no ballot keeps any weight, as the
+    # classic engine does, without rescanning the ballots every round
+    def test_stv_piles_reset(self):
+
+        # Generate data
+        input = [
+            {"count":1, "ballot":["c1", "c2", "c3", "c4"]},
+            {"count":1, "ballot":["c2"]},
+        ]
+        classic = STV(input, required_winners=3).as_dict()
+        piles = BallotPiles(input)
+        positive_ballots = [piles.positive_ballots]
+        piles.transfer_surplus(["c1"], {"c1": 1.0}, 1)
+        positive_ballots.append(piles.positive_ballots)
+        piles.remove_candidates(["c1"])
+        positive_ballots.append(piles.positive_ballots)
+
+        # Run tests
+        self.assertEqual(positive_ballots, [2, 1, 1])
+        self.assertTrue(piles.has_votes())
+        self.assertTrue(any(round.get("note") == "reset" for round in classic["rounds"]))
+        self.assertEqual(STV(input, required_winners=3, engine="piles").as_dict(), classic)
+        self.assertEqual(
+            [round.get("note") for round in STV(input, required_winners=3, engine="fixed_point").as_dict()["rounds"]],
+            [round.get("note") for round in classic["rounds"]]
+        )
+
+    # STV, pile engine with fractional transfers and exhausted ballots
+    def test_stv_piles_engine(self):
+
+        # Generate data
+        input = [
+            {"count":10, "ballot":["c1", "c2", "c3"]},
+            {"count":5, "ballot":["c1", "c4"]},
+            {"count":3, "ballot":["c2"]},
+            {"count":2, "ballot":["c5"]},
+            {"count":4, "ballot":["c3", "c5", "c2"]},
+            {"count":3, "ballot":["c4", "c3"]}
+        ]
+        output = STV(input, required_winners=3, engine="piles").as_dict()
+
+        # Run tests
+        self.assertEqual(output, STV(input, required_winners=3).as_dict())
+        self.assertEqual(output["rounds"][:2], [
+            {'tallies': {'c1': 15.0, 'c2': 3.0, 'c3': 4.0, 'c4': 3.0, 'c5': 2.0}, 'winners': set(['c1'])},
+            {'tallies': {'c2': 8.333333333333332, 'c3': 4.0, 'c4': 5.666666666666666, 'c5': 2.0}, 'winners': set(['c2'])}
+        ])
+        self.assertEqual(output["winners"], set(['c1', 'c2', 'c4']))
+        self.assertRaises(Exception, STV, input, engine="unknown")
+
+    # STV, ballots sharing prefixes are merged in the trie
+    def test_ballot_trie(self):
+
+        # Generate data
+        input = [
+            {"count":3.0, "ballot":["c1", "c2", "c3"]},
+            {"count":2.0, "ballot":["c1", "c2"]},
+            {"count":1.5, "ballot":["c2", "c3"]},
+            {"count":1.0, "ballot":["c3"]}
+        ]
+        trie = BallotTrie(input)
+
+        # Run tests
+        self.assertEqual(trie.tallies(), {'c1': 5.0, 'c2': 1.5, 'c3': 1.0})
+        self.assertEqual(len(trie.nodes["c2"]), 2)
+        trie.remove_candidates(["c1"])
+        self.assertEqual(trie.tallies(), {'c2': 6.5, 'c3': 1.0})
+        self.assertEqual(len(trie.nodes["c2"]), 1)
+        self.assertEqual(trie.root.children["c2"].children["c3"].weight, 4.5)
+        trie.transfer_surplus(["c2"], trie.tallies(), 4)
+        trie.remove_candidates(["c2"])
+        self.assertEqual(trie.tallies(), {'c3': 1.0 + 4.5 * 2.5 / 6.5})
+        self.assertTrue(trie.has_votes())
+
+    # STV, trie engine
+    def test_stv_trie_engine(self):
+
+        # Generate data
+        input = [
+            {"count":4, "ballot":["orange"]},
+            {"count":2, "ballot":["pear", "orange"]},
+            {"count":8, "ballot":["chocolate", "strawberry"]},
+            {"count":4, "ballot":["chocolate", "sweets"]},
+            {"count":1, "ballot":["strawberry"]},
+            {"count":1, "ballot":["sweets"]}
+        ]
+        output = STV(input, required_winners=3, engine="trie").as_dict()
+
+        # Run tests
+        self.assertEqual(output, STV(input, required_winners=3).as_dict())
+
+    # STV, hopeless candidates excluded together
+    def test_stv_bulk_exclusion(self):
+
+        # Generate data
+        input = [
+            {"count":20, "ballot":["A", "B"]},
+            {"count":15, "ballot":["B", "A"]},
+            {"count":12, "ballot":["C", "B"]},
+            {"count":3, "ballot":["D", "C"]},
+            {"count":2, "ballot":["E", "B"]},
+            {"count":1, "ballot":["F", "A"]}
+        ]
+        output = STV(input, bulk_exclusion=True).as_dict()
+
+        # Run tests
+        self.assertEqual(output["rounds"], [
+            {'tallies': {'A': 20.0, 'B': 15.0, 'C': 12.0, 'D': 3.0, 'E': 2.0, 'F': 1.0}, 'losers': set(['D', 'E', 'F'])},
+            {'tallies': {'A': 21.0, 'B': 17.0, 'C': 15.0}, 'loser': 'C'},
+            {'tallies': {'A': 21.0, 'B': 29.0}, 'winners': set(['B'])}
+        ])
+        self.assertEqual(output["winners"], STV(input).as_dict()["winners"])
+        self.assertEqual(len(STV(input).as_dict()["rounds"]), 5)
+
+    # STV, transfer values truncated to five decimal places
+    def test_stv_fixed_point_engine(self):
+
+        # Generate data
+        input = [
+            {"count":10, "ballot":["c1", "c2", "c3"]},
+            {"count":5, "ballot":["c1", "c4"]},
+            {"count":3, "ballot":["c2"]},
+            {"count":2, "ballot":["c5"]},
+            {"count":4, "ballot":["c3", "c5", "c2"]},
+            {"count":3, "ballot":["c4", "c3"]}
+        ]
+        output = STV(input, required_winners=3, engine="fixed_point").as_dict()
+
+        # Run tests
+        self.assertEqual(output["rounds"][1:3], [
+            {'tallies': {'c2': Decimal('8.33330'), 'c3': Decimal('4.00000'), 'c4': Decimal('5.66665'), 'c5': Decimal('2.00000')}, 'winners': set(['c2'])},
+            {'tallies': {'c3': Decimal('4.85320'), 'c4': Decimal('5.66665'), 'c5': Decimal('2.00000')}, 'loser': 'c5'}
+        ])
+        self.assertEqual(output["winners"], set(['c1', 'c2', 'c4']))
+        self.assertEqual(STV(input, required_winners=3, engine="fixed_point", precision=2).as_dict()["rounds"][1]["tallies"]["c2"], Decimal('8.30'))
+        self.assertRaises(Exception, STV, [{"count":0.5, "ballot":["c1"]}], engine="fixed_point")
+
+    # STV, progress reported before each round and cancellation
+    def test_stv_progress_and_cancellation(self):
+
+        # Generate data
+        input = [
+            {"count":56, "ballot":["c1", "c2", "c3"]},
+            {"count":40, "ballot":["c2", "c3", "c1"]},
+            {"count":20, "ballot":["c3", "c1", "c2"]}
+        ]
+        original = copy.deepcopy(input)
+        steps = []
+        output = STV(input, required_winners=2, progress=lambda *step: steps.append(step)).as_dict()
+        cancel = threading.Event()
+        cancel.set()
+
+        # Run tests
+        self.assertEqual(steps, [("rounds", i, None) for i in range(len(output["rounds"]))])
+        for engine in ["classic", "piles", "trie", "fixed_point"]:
+            self.assertRaises(Exception, STV, input, required_winners=2, engine=engine, cancel=cancel)
+        self.assertEqual(input, original)
+
 if __name__ == "__main__":
     unittest.main()
@@ -47,5 +47,15 @@ class TestTieBreaker(unittest.TestCase):
             ('c', 'b')
         )
 
+    def test_order_ties(self):
+        self.assertEqual(
+            self.tieBreaker.order_ties(set(['d', 'b', 'c'])),
+            ['b', 'c', 'd']
+        )
+        self.assertEqual(
+            self.tieBreaker.order_ties(set([('c', 'a'), ('b', 'd'), ('c', 'b')]), reverse=True),
+            [('c', 'b'), ('c', 'a'), ('b', 'd')]
+        )
+
 if __name__ == "__main__":
     unittest.main()